@@ -2,3 +2,11 @@
 from backend.models.group import Group
 from backend.models.transaction import Transaction
 from backend.models.payment import Payment # Ensure all models are imported
+from backend.models.member_total import GroupMemberTotal
+from backend.models.transaction_entry import TransactionEntry
+from backend.models.ledger_event import LedgerEvent
+from backend.models.balance_checkpoint import BalanceCheckpoint
+from backend.models.receipt_job import ReceiptJob
+from backend.models.history_archive import TransactionArchive, PaymentArchive
+from backend.models.spending_rollup import DailySpending
+from backend.models.group_membership import GroupMembership
@@ -0,0 +1,148 @@
+# Native async versions of the read endpoints in api/groups.py, served by asgi.py over
+# SQLAlchemy's asyncpg driver. Responses, status codes and ETags match the Flask views;
+# everything not routed here falls through to the Flask app.
+import asyncio
+import re
+from sqlalchemy import func, select
+from backend.models.group import Group
+from backend.models.transaction import Transaction
+from backend.models.payment import Payment
+from backend.models.member_total import GroupMemberTotal
+from backend.models.history_archive import TransactionArchive
+from backend.helper.helper import settle_up
+from backend.helper.settlement import GREEDY, SETTLEMENT_MODES
+from backend.helper.pagination import (
+    is_paginated, parse_page_args, page_query, finish_page, InvalidPageRequest, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+)
+from backend.helper.filters import filter_transactions, filter_payments, InvalidFilter
+from backend.helper.summary import parse_summary_fields, group_aggregates_statement
+from backend.helper.serialization import history_columns, serialize_rows
+
+
+def not_found():
+    return {"message": "Group not found"}, 404
+
+
+async def get_usernames(session, group, args, config):
+    return {"name": group['name'], "usernames": group['usernames']}, 200
+
+
+async def get_balances(session, group, args, config):
+    return {"balances": group['balances']}, 200
+
+
+async def get_settlements(session, group, args, config):
+    mode = args.get('mode', GREEDY)
+    if mode not in SETTLEMENT_MODES:
+        return {"message": f"Invalid mode. Choose one of: {', '.join(SETTLEMENT_MODES)}"}, 400
+    if mode == GREEDY:
+        settlements = settle_up(group['balances'], mode)
+    else:
+        # The exact search can use its whole time budget; keep it off the event loop
+        settlements = await asyncio.to_thread(settle_up, group['balances'], mode, config['SETTLEMENT_TIME_BUDGET'])
+    return {"settlements": settlements}, 200
+
+
+async def get_total_expenditure(session, group, args, config):
+    live = await session.scalar(select(func.sum(Transaction.amount)).where(Transaction.group_id == group['id']))
+    archived = await session.scalar(select(func.sum(TransactionArchive.total_amount)).where(TransactionArchive.group_id == group['id']))
+    return {"total_expenditure": (live or 0) + (archived or 0)}, 200
+
+
+async def get_user_expenditures(session, group, args, config):
+    rows = await session.execute(select(GroupMemberTotal.username, GroupMemberTotal.total_spent).where(
+        GroupMemberTotal.group_id == group['id'], GroupMemberTotal.transaction_count > 0))
+    return {"user_expenditure": {username: total_spent for username, total_spent in rows}}, 200
+
+
+async def history(session, args, statement, datetime_column, id_column, key, bare_list=False):
+    if is_paginated(args):
+        try:
+            limit, after = parse_page_args(args)
+        except InvalidPageRequest as e:
+            return {"message": str(e)}, 400
+        rows = (await session.execute(page_query(statement, datetime_column, id_column, limit, after))).all()
+        rows, next_cursor = finish_page(rows, datetime_column, id_column, limit)
+        return {key: serialize_rows(rows), "next_cursor": next_cursor}, 200
+
+    rows = (await session.execute(statement.order_by(datetime_column.desc()))).all()
+    records = serialize_rows(rows)
+    return (records if bare_list else {key: records}), 200
+
+
+async def get_group_transactions(session, group, args, config, saved=False):
+    statement = select(*history_columns(Transaction)).where(Transaction.group_id == group['id'])
+    if saved:
+        statement = statement.where(Transaction.is_saved.is_(True))
+    try:
+        statement = filter_transactions(statement, args)
+    except InvalidFilter as e:
+        return {"message": str(e)}, 400
+    # The unpaginated /transactions response has always been a bare list
+    return await history(session, args, statement, Transaction.datetime_transaction, Transaction.id, 'transactions',
+                         bare_list=not saved)
+
+
+async def get_group_saved_transactions(session, group, args, config):
+    return await get_group_transactions(session, group, args, config, saved=True)
+
+
+async def get_group_payments(session, group, args, config):
+    try:
+        statement = filter_payments(select(*history_columns(Payment)).where(Payment.group_id == group['id']), args)
+    except InvalidFilter as e:
+        return {"message": str(e)}, 400
+    return await history(session, args, statement, Payment.datetime_payment, Payment.id, 'payments')
+
+
+async def get_group_summary(session, group, args, config):
+    try:
+        fields = parse_summary_fields(args.get('fields'))
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError as e:
+        return {"message": str(e)}, 400
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return {"message": f"limit must be between 1 and {MAX_PAGE_SIZE}"}, 400
+    mode = args.get('mode', GREEDY)
+    if mode not in SETTLEMENT_MODES:
+        return {"message": f"Invalid mode. Choose one of: {', '.join(SETTLEMENT_MODES)}"}, 400
+
+    summary = {"id": group['id'], "name": group['name'], "version": group['version']}
+    if 'members' in fields:
+        summary['members'] = group['usernames']
+    if 'balances' in fields:
+        summary['balances'] = group['balances']
+    if 'settlements' in fields:
+        summary['settlements'] = (await get_settlements(session, group, {'mode': mode}, config))[0]['settlements']
+    statement = group_aggregates_statement(fields)
+    if statement is not None:
+        row = (await session.execute(statement, {'group_id': group['id'], 'limit': limit})).mappings().one()
+        summary.update(row)
+    return summary, 200
+
+
+async def load_group(session, group_id):
+    group = await session.get(Group, group_id)
+    return group.to_dict() if group else None
+
+
+# (pattern, endpoint name, handler); only GET requests are routed here
+ROUTES = [(re.compile(r'^/api/group/(?P<group_id>\d+)/' + path + '$'), name, handler) for path, name, handler in (
+    ('usernames', 'get_usernames', get_usernames),
+    ('balances', 'get_balances', get_balances),
+    ('settlements', 'get_settlements', get_settlements),
+    ('total_expenditure', 'get_total_expenditure', get_total_expenditure),
+    ('user_expenditure', 'get_user_expenditures', get_user_expenditures),
+    ('transactions', 'get_group_transactions', get_group_transactions),
+    ('saved_transactions', 'get_group_saved_transactions', get_group_saved_transactions),
+    ('payments', 'get_group_payments', get_group_payments),
+    ('summary', 'get_group_summary', get_group_summary),
+)]
+
+
+def match_route(path):
+    for pattern, name, handler in ROUTES:
+        match = pattern.match(path)
+        if match:
+            return name, handler, int(match.group('group_id'))
+    return None
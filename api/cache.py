@@ -0,0 +1,8 @@
+from flask import Blueprint, jsonify
+from backend.cache import cache
+
+bp = Blueprint('cache', __name__)
+
+@bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({"cache": cache.stats()}), 200
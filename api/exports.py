@@ -0,0 +1,111 @@
+import csv
+import heapq
+import io
+import json
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from sqlalchemy import select
+from backend.db import db
+from backend.models.group import Group
+from backend.models.transaction import Transaction
+from backend.models.payment import Payment
+from backend.models.history_archive import TransactionArchive, PaymentArchive
+from backend.helper.versioning import versioned
+from backend.helper.replicas import read_only
+from backend.helper.partitions import parse_archived_datetime
+
+bp = Blueprint('exports', __name__)
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+CSV_COLUMNS = ['type', 'id', 'datetime', 'description', 'amount', 'mode', 'paid_by', 'paid_for', 'share_details',
+               'paid_from', 'paid_to', 'is_saved']
+
+
+def stream_rows(table, datetime_column, group_id, kind):
+    # yield_per switches psycopg2 to a named server-side cursor, so rows arrive in batches
+    # instead of the whole history being buffered in the worker
+    columns = [column for column in table.c if column.computed is None]
+    statement = select(*columns).where(table.c.group_id == group_id) \
+        .order_by(datetime_column, table.c.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    for row in db.session.execute(statement):
+        record = dict(row._mapping)
+        record['datetime'] = record.pop(datetime_column.key)
+        record['type'] = kind
+        yield record
+
+
+def stream_archived_rows(archive, datetime_key, group_id, kind):
+    # One archived month at a time, so memory is bounded by the largest month
+    statement = select(archive.rows).where(archive.group_id == group_id).order_by(archive.month) \
+        .execution_options(yield_per=1)
+    for (rows,) in db.session.execute(statement):
+        for record in rows:
+            record['datetime'] = parse_archived_datetime(record.pop(datetime_key))
+            record['type'] = kind
+            yield record
+
+
+def ledger_records(group_id):
+    transactions = stream_rows(Transaction.__table__, Transaction.__table__.c.datetime_transaction, group_id, 'transaction')
+    payments = stream_rows(Payment.__table__, Payment.__table__.c.datetime_payment, group_id, 'payment')
+    archived_transactions = stream_archived_rows(TransactionArchive, 'datetime_transaction', group_id, 'transaction')
+    archived_payments = stream_archived_rows(PaymentArchive, 'datetime_payment', group_id, 'payment')
+    return heapq.merge(archived_transactions, archived_payments, transactions, payments,
+                       key=lambda record: (record['datetime'], record['type'], record['id']))
+
+
+def export_ndjson(records):
+    chunk, size = [], 0
+    for record in records:
+        record['datetime'] = record['datetime'].isoformat()
+        line = json.dumps(record) + '\n'
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    yield ''.join(chunk)
+
+
+def export_csv(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    # The header goes out straight away; rows are flushed in ~64KB chunks
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+    for record in records:
+        record['datetime'] = record['datetime'].isoformat()
+        for key in ('paid_by', 'paid_for', 'share_details'):
+            if record.get(key) is not None:
+                record[key] = json.dumps(record[key])
+        writer.writerow(record)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+@bp.route('/group/<int:group_id>/export', methods=['GET'])
+@read_only
+@versioned
+def export_ledger(group_id):
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"message": f"Invalid format. Choose one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    group = Group.query.get(group_id)
+    if not group:
+        return jsonify({"message": "Group not found"}), 404
+
+    if export_format == 'csv':
+        body, mimetype = export_csv(ledger_records(group_id)), 'text/csv'
+    else:
+        body, mimetype = export_ndjson(ledger_records(group_id)), 'application/x-ndjson'
+
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=group-{group_id}-ledger.{export_format}'
+    })
@@ -1,11 +1,26 @@
 import sys
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from backend.db import db
 from backend.models.group import Group
 from backend.models.transaction import Transaction
 from backend.models.payment import Payment
-from backend.helper.helper import calculate_user_expenditures
+from backend.models.member_total import GroupMemberTotal
+from backend.models.transaction_entry import TransactionEntry
 from backend.helper.helper import settle_up
+from backend.helper.settlement import GREEDY, SETTLEMENT_MODES
+from backend.helper.totals import rename_member_totals
+from backend.helper.entries import rename_transaction_entries
+from backend.helper.rollups import rename_spending_rollup, series_buckets, load_spending_series, InvalidSeriesRequest
+from backend.helper.ledger import record_event
+from backend.helper.memberships import sync_group_memberships
+from backend.helper.versioning import bump_group_version, versioned
+from backend.helper.replicas import read_only
+from backend.helper.group_cache import group_snapshot, cached_for_version
+from backend.helper.pagination import is_paginated, parse_page_args, paginate, InvalidPageRequest, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from backend.helper.filters import filter_transactions, filter_payments, InvalidFilter
+from backend.helper.partitions import archived_total_expenditure, rename_archived_member
+from backend.helper.summary import parse_summary_fields, load_group_aggregates
+from backend.helper.serialization import history_columns, serialize_rows
 from sqlalchemy.orm.attributes import flag_modified
 
 bp = Blueprint('groups', __name__)
@@ -36,6 +51,8 @@ def create_group():
         group = Group(name=name, usernames=usernames,balances=balances)
 
         db.session.add(group)
+        sync_group_memberships(group)
+        record_event(group, 'group', 'add', payload={'usernames': list(balances)})
         db.session.commit()
 
         return jsonify({"message": "Group added", "group": group.to_dict()}), 201
@@ -53,6 +70,7 @@ def update_group_name(group_id):
         if new_group_name:
             try:
                 group.name=new_group_name
+                bump_group_version(group)
                 db.session.commit()
                 return jsonify({"message": "Group name updated","group":group.to_dict()}), 200
             
@@ -64,7 +82,8 @@ def update_group_name(group_id):
                 
 @bp.route('/group/<int:group_id>/add_username', methods=['PUT'])
 def add_username(group_id):
-    group = Group.query.get(group_id)
+    # Membership changes rewrite the balances document, so hold the row lock against concurrent balance deltas
+    group = Group.query.with_for_update().filter_by(id=group_id).first()
     if group:
         data = request.get_json()
         new_username = data.get('new_username')
@@ -79,6 +98,9 @@ def add_username(group_id):
                 group.balances[new_username] = 0
                 # Mark the 'balances' field as modified
                 flag_modified(group, "balances")
+                sync_group_memberships(group)
+                bump_group_version(group)
+                record_event(group, 'member', 'add', payload={'username': new_username})
                 db.session.commit()
                 
                 return jsonify({"message": "Username added","group":group.to_dict()}), 200
@@ -121,6 +143,11 @@ def update_transactions_and_payments(group_id, old_username, new_username):
                 payment.paid_to = new_username
             db.session.add(payment)
 
+        rename_member_totals(group_id, old_username, new_username)
+        rename_transaction_entries(group_id, old_username, new_username)
+        rename_spending_rollup(group_id, old_username, new_username)
+        rename_archived_member(group_id, old_username, new_username)
+
     except Exception as e:
         db.session.rollback()
         raise RuntimeError(f"Error updating transactions or payments: {e}")
@@ -129,7 +156,8 @@ def update_transactions_and_payments(group_id, old_username, new_username):
 # Route to update username
 @bp.route('/group/<int:group_id>/update_username/<string:username>', methods=['PUT'])
 def update_username(group_id, username):
-    group = Group.query.get(group_id)
+    # Membership changes rewrite the balances document, so hold the row lock against concurrent balance deltas
+    group = Group.query.with_for_update().filter_by(id=group_id).first()
     if not group:
         return jsonify({"message": "Group not found"}), 404
 
@@ -162,6 +190,9 @@ def update_username(group_id, username):
 
             # Update transactions and payments
             update_transactions_and_payments(group_id, username, new_username)
+            # Bumped before the ledger event, as in delete_username, so the published change carries the new version
+            bump_group_version(group)
+            record_event(group, 'member', 'rename', payload={'old': username, 'new': new_username})
 
         # Handle UPI ID update
         if new_upi_id and not new_username:
@@ -170,10 +201,12 @@ def update_username(group_id, username):
                 if u['username'] == username:
                     u['upi_id'] = new_upi_id
                     break
+            bump_group_version(group)
 
         # Mark fields as modified and commit changes
         flag_modified(group, "usernames")
         flag_modified(group, "balances")
+        sync_group_memberships(group)
         db.session.commit()
 
         return jsonify({"message": "User information updated","group":group.to_dict()}), 200
@@ -186,7 +219,8 @@ def update_username(group_id, username):
 # Route to delete username
 @bp.route('/group/<int:group_id>/delete_username/<string:username>', methods=['DELETE'])
 def delete_username(group_id, username):
-    group = Group.query.get(group_id)
+    # Membership changes rewrite the balances document, so hold the row lock against concurrent balance deltas
+    group = Group.query.with_for_update().filter_by(id=group_id).first()
     if not group:
         return jsonify({"message": "Group not found"}), 404
 
@@ -203,6 +237,9 @@ def delete_username(group_id, username):
         update_transactions_and_payments(group_id, username, new_username)
         flag_modified(group, "balances")
         flag_modified(group, "usernames")
+        sync_group_memberships(group)
+        bump_group_version(group)
+        record_event(group, 'member', 'remove', payload={'username': username})
         db.session.commit()
 
         return jsonify({"message": "Username deleted","group":group.to_dict()}), 200
@@ -213,65 +250,213 @@ def delete_username(group_id, username):
 
 
 @bp.route('/group/<int:group_id>/usernames',methods=['GET'])
+@read_only
+@versioned
 def get_usernames(group_id):
-    group=Group.query.get(group_id)
+    group=group_snapshot(group_id)
     if group:
-        return jsonify({"name":group.name,"usernames":group.usernames})
+        return jsonify({"name":group['name'],"usernames":group['usernames']})
     return jsonify({"message": "Group not found"}), 404
 
 @bp.route('/group/<int:group_id>/transactions', methods=['GET'])
+@read_only
+@versioned
 def get_group_transactions(group_id):
     group = Group.query.get(group_id)
     if group:
-        transactions = Transaction.query.filter_by(group_id=group_id).order_by(Transaction.datetime_transaction.desc()).all()
-        return jsonify([transaction.to_dict() for transaction in transactions]), 200
+        try:
+            query = filter_transactions(transaction_rows().filter(Transaction.group_id == group_id), request.args)
+        except InvalidFilter as e:
+            return jsonify({"message": str(e)}), 400
+        if is_paginated(request.args):
+            return paginated_response(query, Transaction.datetime_transaction, Transaction.id, 'transactions')
+        transactions = query.order_by(Transaction.datetime_transaction.desc()).all()
+        return jsonify(serialize_rows(transactions)), 200
     return jsonify({"message": "Group not found"}), 404
 
 @bp.route('/group/<int:group_id>/saved_transactions', methods=['GET'])
+@read_only
+@versioned
 def get_group_saved_transactions(group_id):
     group = Group.query.get(group_id)
     if group:
-        transactions = Transaction.query.filter_by(group_id=group_id,is_saved=True).order_by(Transaction.datetime_transaction.desc()).all()
-        return jsonify({transactions:[transaction.to_dict() for transaction in transactions]}), 200
+        try:
+            query = filter_transactions(transaction_rows().filter(Transaction.group_id == group_id, Transaction.is_saved.is_(True)), request.args)
+        except InvalidFilter as e:
+            return jsonify({"message": str(e)}), 400
+        if is_paginated(request.args):
+            return paginated_response(query, Transaction.datetime_transaction, Transaction.id, 'transactions')
+        transactions = query.order_by(Transaction.datetime_transaction.desc()).all()
+        return jsonify({"transactions": serialize_rows(transactions)}), 200
     return jsonify({"message": "Group not found"}), 404
 
 @bp.route('/group/<int:group_id>/payments', methods=['GET'])
+@read_only
+@versioned
 def get_group_payments(group_id):
     group = Group.query.get(group_id)
     if group:
-        payments = Payment.query.filter_by(group_id=group_id).order_by(Payment.datetime_payment.desc()).all()
-        return jsonify({"payments":[payment.to_dict() for payment in payments]}), 200
+        try:
+            query = filter_payments(payment_rows().filter(Payment.group_id == group_id), request.args)
+        except InvalidFilter as e:
+            return jsonify({"message": str(e)}), 400
+        if is_paginated(request.args):
+            return paginated_response(query, Payment.datetime_payment, Payment.id, 'payments')
+        payments = query.order_by(Payment.datetime_payment.desc()).all()
+        return jsonify({"payments": serialize_rows(payments)}), 200
     return jsonify({"message": "Group not found"}), 404
 
+# History lists select plain column tuples; building ORM objects only to call to_dict() dominated large groups
+def transaction_rows():
+    return db.session.query(*history_columns(Transaction))
+
+def payment_rows():
+    return db.session.query(*history_columns(Payment))
+
+# Helper function for the ?limit=&after= variant of the history endpoints
+def paginated_response(query, datetime_column, id_column, key):
+    try:
+        limit, after = parse_page_args(request.args)
+    except InvalidPageRequest as e:
+        return jsonify({"message": str(e)}), 400
+
+    rows, next_cursor = paginate(query, datetime_column, id_column, limit, after)
+    return jsonify({key: serialize_rows(rows), "next_cursor": next_cursor}), 200
+
 @bp.route('/group/<int:group_id>/total_expenditure', methods=['GET'])
+@read_only
+@versioned
 def get_total_expenditure(group_id):
-    group = Group.query.get(group_id)
+    group = group_snapshot(group_id)
     if group:
-        total_expenditure = db.session.query(db.func.sum(Transaction.amount)).filter_by(group_id=group_id).scalar() or 0
+        total_expenditure = cached_for_version('total_expenditure', group, lambda: (
+            (db.session.query(db.func.sum(Transaction.amount)).filter_by(group_id=group_id).scalar() or 0)
+            + archived_total_expenditure(group_id)))
         return jsonify({"total_expenditure": total_expenditure}), 200
     return jsonify({"message": "Group not found"}), 404
 
 @bp.route('/group/<int:group_id>/user_expenditure', methods=['GET'])
+@read_only
+@versioned
 def get_user_expenditures(group_id):
-    group = Group.query.get(group_id)
+    group = group_snapshot(group_id)
     if group:
-        transactions = Transaction.query.filter_by(group_id=group_id).all()
-        user_expenditures= calculate_user_expenditures(transactions)
+        user_expenditures = cached_for_version('user_expenditure', group, lambda: load_user_expenditures(group_id))
         return jsonify({"user_expenditure":user_expenditures}), 200
     return jsonify({"message": "Group not found"}), 404
 
+def load_user_expenditures(group_id):
+    totals = GroupMemberTotal.query.filter(GroupMemberTotal.group_id == group_id, GroupMemberTotal.transaction_count > 0).all()
+    return {total.username: total.total_spent for total in totals}
+
+@bp.route('/group/<int:group_id>/member/<string:username>/transactions', methods=['GET'])
+@read_only
+@versioned
+def get_member_transactions(group_id, username):
+    group = Group.query.get(group_id)
+    if not group:
+        return jsonify({"message": "Group not found"}), 404
+
+    try:
+        limit, after = parse_page_args(request.args)
+        query = filter_transactions(transaction_rows(), request.args)
+    except (InvalidPageRequest, InvalidFilter) as e:
+        return jsonify({"message": str(e)}), 400
+
+    # Served from the (group_id, member) index on transaction_entries instead of scanning JSONB
+    involved = db.session.query(TransactionEntry.transaction_id).filter_by(group_id=group_id, member=username)
+    role = request.args.get('role')
+    if role:
+        involved = involved.filter_by(role=role)
+    query = query.filter(Transaction.group_id == group_id, Transaction.id.in_(involved))
+    transactions, next_cursor = paginate(query, Transaction.datetime_transaction, Transaction.id, limit, after)
+    return jsonify({"transactions": serialize_rows(transactions), "next_cursor": next_cursor}), 200
+
+@bp.route('/group/<int:group_id>/member/<string:username>/summary', methods=['GET'])
+@read_only
+@versioned
+def get_member_summary(group_id, username):
+    group = Group.query.get(group_id)
+    if not group:
+        return jsonify({"message": "Group not found"}), 404
+
+    rows = db.session.query(TransactionEntry.role, db.func.sum(TransactionEntry.amount), db.func.count(TransactionEntry.id)) \
+        .filter_by(group_id=group_id, member=username).group_by(TransactionEntry.role).all()
+    summary = {role: {"total": total, "count": count} for role, total, count in rows}
+    return jsonify({"username": username, "paid": summary.get('payer', {"total": 0, "count": 0}),
+                    "share": summary.get('share', {"total": 0, "count": 0})}), 200
+
+@bp.route('/group/<int:group_id>/spending', methods=['GET'])
+@read_only
+@versioned
+def get_spending_series(group_id):
+    # Spend over time from the daily rollup; ?granularity=day|month&from=&to=&member=<username> (repeatable)
+    group = group_snapshot(group_id)
+    if not group:
+        return jsonify({"message": "Group not found"}), 404
+    try:
+        granularity, buckets = series_buckets(request.args)
+    except InvalidSeriesRequest as e:
+        return jsonify({"message": str(e)}), 400
+
+    members = request.args.getlist('member')
+    series = cached_for_version('spending', group, lambda: load_spending_series(group_id, granularity, buckets, members),
+                                granularity, buckets[0], buckets[-1], tuple(members))
+    return jsonify(series), 200
+
 @bp.route('/group/<int:group_id>/balances', methods=['GET'])
+@read_only
+@versioned
 def get_balances(group_id):
-    group = Group.query.get(group_id)
+    group = group_snapshot(group_id)
     if group:
-        balances = group.balances
+        balances = group['balances']
         return jsonify({"balances": balances}), 200
     return jsonify({"message": "Group not found"}), 404
 
 @bp.route('/group/<int:group_id>/settlements', methods=['GET'])
+@read_only
+@versioned
 def get_settlements(group_id):
-    group = Group.query.get(group_id)
+    mode = request.args.get('mode', GREEDY)
+    if mode not in SETTLEMENT_MODES:
+        return jsonify({"message": f"Invalid mode. Choose one of: {', '.join(SETTLEMENT_MODES)}"}), 400
+
+    group = group_snapshot(group_id)
     if group:
-        settlements = settle_up(group.balances)
+        settlements = cached_for_version('settlements', group, lambda: settle_up(
+            group['balances'], mode, current_app.config['SETTLEMENT_TIME_BUDGET']), mode)
         return jsonify({"settlements": settlements}), 200
     return jsonify({"message": "Group not found"}), 404
+
+@bp.route('/group/<int:group_id>/summary', methods=['GET'])
+@read_only
+@versioned
+def get_group_summary(group_id):
+    # Everything the group screen needs: the cached group row plus at most one aggregate query
+    try:
+        fields = parse_summary_fields(request.args.get('fields'))
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"message": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+    mode = request.args.get('mode', GREEDY)
+    if mode not in SETTLEMENT_MODES:
+        return jsonify({"message": f"Invalid mode. Choose one of: {', '.join(SETTLEMENT_MODES)}"}), 400
+
+    group = group_snapshot(group_id)
+    if not group:
+        return jsonify({"message": "Group not found"}), 404
+
+    summary = {"id": group['id'], "name": group['name'], "version": group['version']}
+    if 'members' in fields:
+        summary['members'] = group['usernames']
+    if 'balances' in fields:
+        summary['balances'] = group['balances']
+    if 'settlements' in fields:
+        summary['settlements'] = cached_for_version('settlements', group, lambda: settle_up(
+            group['balances'], mode, current_app.config['SETTLEMENT_TIME_BUDGET']), mode)
+    summary.update(cached_for_version('summary', group, lambda: load_group_aggregates(group_id, fields, limit),
+                                      tuple(fields), limit))
+    return jsonify(summary), 200
@@ -0,0 +1,170 @@
+import json
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from backend.db import db
+from backend.models.group import Group
+from backend.models.transaction import Transaction
+from backend.models.payment import Payment
+from backend.models.transaction_entry import TransactionEntry
+from backend.helper.helper import process_transaction_data, process_payment_data
+from backend.helper.balances import transaction_balance_deltas, payment_balance_deltas, apply_balance_deltas
+from backend.helper.totals import transaction_total_deltas, apply_member_totals
+from backend.helper.entries import transaction_entry_rows
+from backend.helper.rollups import apply_spending_rollup
+from backend.helper.ledger import record_event
+from backend.helper.split import expand_split, amounts_match, SplitError
+
+bp = Blueprint('imports', __name__)
+
+TRANSACTION_COLUMNS = ('group_id', 'description', 'amount', 'paid_by', 'mode', 'paid_for', 'share_details',
+                       'datetime_transaction', 'is_saved')
+PAYMENT_COLUMNS = ('group_id', 'amount', 'paid_from', 'paid_to', 'datetime_payment')
+
+
+def read_import_rows():
+    # NDJSON is read line by line off the request stream; anything else must be a JSON array
+    if request.mimetype == 'application/x-ndjson':
+        for line in request.stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    else:
+        rows = request.get_json()
+        if not isinstance(rows, list):
+            raise ValueError("Expected a JSON array of rows")
+        yield from rows
+
+
+def is_positive_amount(amount):
+    # bool is an int subclass, so True would otherwise import as an amount of 1
+    return isinstance(amount, (int, float)) and not isinstance(amount, bool) and amount > 0
+
+
+def datetime_error(row, key):
+    # Checked here so an unparseable value rejects its row instead of failing the whole INSERT
+    value = row.get(key)
+    if value is None:
+        return None
+    try:
+        datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return f"{key} must be an ISO 8601 date or datetime"
+    return None
+
+
+def validate_transaction_row(row, members):
+    if not is_positive_amount(row.get('amount')):
+        return "amount must be a positive number"
+    amount = row['amount']
+    paid_by, share_details = row.get('paid_by'), row.get('share_details')
+    if not paid_by or not share_details:
+        return "paid_by and share_details are required"
+
+    usernames = {payer['username'] for payer in paid_by} | {share['username'] for share in share_details}
+    usernames |= set(row.get('paid_for') or [])
+    if not usernames <= members:
+        return "Invalid username(s) in the transaction"
+    if not amounts_match(amount, paid_by) or not amounts_match(amount, share_details):
+        return "Total amount paid or shared does not match the transaction amount"
+    return datetime_error(row, 'datetime_transaction')
+
+
+def validate_payment_row(row, members):
+    if not is_positive_amount(row.get('amount')):
+        return "amount must be a positive number"
+    if row.get('paid_from') not in members or row.get('paid_to') not in members:
+        return "Invalid username(s) in the payment"
+    if row['paid_from'] == row['paid_to']:
+        return "paid_from and paid_to must differ"
+    return datetime_error(row, 'datetime_payment')
+
+
+@bp.route('/group/<int:group_id>/import', methods=['POST'])
+def bulk_import(group_id):
+    group = Group.query.get(group_id)
+    if not group:
+        return jsonify({"message": "Group not found"}), 404
+
+    partial = request.args.get('partial', 'false').lower() == 'true'
+    max_rows = current_app.config['BULK_IMPORT_MAX_ROWS']
+    members = {user['username'] for user in group.usernames}
+
+    transactions, payments, errors = [], [], []
+    try:
+        for index, row in enumerate(read_import_rows()):
+            if index >= max_rows:
+                return jsonify({"message": f"Too many rows, the limit is {max_rows}"}), 413
+            if not isinstance(row, dict):
+                errors.append({"row": index, "message": "Row must be an object"})
+                continue
+
+            row_type = row.get('type', 'transaction')
+            try:
+                if row_type == 'transaction':
+                    error = validate_transaction_row(expand_split(row), members)
+                    if not error:
+                        transactions.append(Transaction(group_id=group_id, **process_transaction_data(row)))
+                elif row_type == 'payment':
+                    error = validate_payment_row(row, members)
+                    if not error:
+                        payments.append(Payment(group_id=group_id, **process_payment_data(row)))
+                else:
+                    error = "type must be 'transaction' or 'payment'"
+            except SplitError as e:
+                error = str(e)
+            except (KeyError, TypeError, AttributeError, ValueError) as e:
+                # Wrongly shaped fields (e.g. paid_by as a string) reject the row, not the whole import
+                error = f"Malformed row: {e}"
+            if error:
+                errors.append({"row": index, "message": error})
+    except ValueError as e:
+        return jsonify({"message": f"Invalid import body: {e}"}), 400
+
+    if errors and not partial:
+        return jsonify({"message": "Import rejected, no rows were imported", "errors": errors}), 400
+
+    try:
+        if transactions:
+            # One executemany round for all rows; ids come back in parameter order for the entries
+            ids = db.session.execute(
+                insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+                [{column: getattr(transaction, column) for column in TRANSACTION_COLUMNS} for transaction in transactions]
+            ).scalars().all()
+            entries = []
+            for transaction, transaction_id in zip(transactions, ids):
+                transaction.id = transaction_id
+                entries.extend(transaction_entry_rows(transaction))
+            db.session.execute(insert(TransactionEntry), entries)
+            apply_spending_rollup(ids, 1)
+        if payments:
+            db.session.execute(insert(Payment),
+                               [{column: getattr(payment, column) for column in PAYMENT_COLUMNS} for payment in payments])
+
+        # Fold every row into a single balance update and a single totals upsert
+        deltas, totals = {}, {}
+        for transaction in transactions:
+            for username, delta in transaction_balance_deltas(transaction, 'add').items():
+                deltas[username] = deltas.get(username, 0) + delta
+            for username, entry in transaction_total_deltas(transaction, 'add').items():
+                total = totals.setdefault(username, {'spent': 0, 'paid': 0, 'count': 0})
+                for key in total:
+                    total[key] += entry[key]
+        for payment in payments:
+            for username, delta in payment_balance_deltas(payment, 'add').items():
+                deltas[username] = deltas.get(username, 0) + delta
+
+        apply_balance_deltas(group, deltas)
+        apply_member_totals(group_id, totals)
+        record_event(group, 'import', 'add', deltas=deltas,
+                     payload={'transactions': len(transactions), 'payments': len(payments)})
+        db.session.commit()
+
+        return jsonify({"message": "Import completed",
+                        "imported": {"transactions": len(transactions), "payments": len(payments)},
+                        "errors": errors}), 200
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"message": "Database error occurred", "error": str(e)}), 500
@@ -0,0 +1,24 @@
+from flask import Blueprint, Response
+from backend.cache import cache
+from backend.helper.metrics import metrics
+from backend.helper.ocr import receipt_jobs
+from backend.helper.write_batching import write_batcher
+
+bp = Blueprint('metrics', __name__)
+
+metrics.collector('splitter_cache_entries', 'Entries held by the read-through cache.',
+                  lambda: {(): cache.stats()['entries']})
+metrics.collector('splitter_cache_events_total', 'Read-through cache lookups and removals by outcome.',
+                  lambda: {(('event', key),): value for key, value in cache.stats().items()
+                           if key in ('hits', 'misses', 'evictions', 'expirations', 'invalidations')},
+                  kind='counter')
+metrics.collector('splitter_receipt_jobs_in_flight', 'Receipt jobs running or waiting for a worker.',
+                  lambda: {(): receipt_jobs.stats()['in_flight']})
+metrics.collector('splitter_write_queue_depth', 'Writes waiting for their group commit batch to run.',
+                  lambda: {(): write_batcher.stats()['queued']})
+metrics.collector('splitter_write_batches_open', 'Group commit batches still accepting writes.',
+                  lambda: {(): write_batcher.stats()['open_batches']})
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -1,44 +1,32 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import insert
 from backend.db import db
 from backend.websocket import socketio
 from backend.models.payment import Payment
 from backend.models.group import Group
 from datetime import datetime
-from backend.helper.helper import update_balances_payment, settle_up, validate_usernames,process_payment_data
+from backend.helper.helper import validate_usernames,process_payment_data, settle_up
+from backend.helper.settlement import GREEDY, SETTLEMENT_MODES
+from backend.helper.balances import payment_balance_deltas, apply_balance_deltas, write_balance_deltas
+from backend.helper.ledger import record_event
+from backend.helper.versioning import versioned, etag_for
+from backend.helper.replicas import read_only
+from backend.helper.write_batching import run_group_write
 from flask_socketio import emit
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm.attributes import flag_modified
 
 bp = Blueprint('payments', __name__)
 
 @bp.route('/group/<int:group_id>/payment', methods=['POST'])
 def add_payment(group_id):
     try:
-        group = Group.query.get(group_id)
-        if not group:
-            return jsonify({"message": "Group not found"}), 404
-        
         try:
             data = request.get_json()
         except ValueError:
             return jsonify({"message": "Invalid JSON input"}), 400
-        
-        if not validate_usernames(group, data):
-            return jsonify({"message": "Invalid username(s) in the transaction"}), 400
-
-        payment_data = process_payment_data(data) 
-        payment = Payment(group_id=group_id, **payment_data)
-        db.session.add(payment)
 
-        # Update balances and get new settlements
-        updated_balances = update_balances_payment(group.balances or {}, payment, 'add')
-
-        # Update the group with new balances and commit
-        group.balances = updated_balances
-        flag_modified(group, "balances")
-        db.session.commit()
-
-        return jsonify({"message": "Payment added", "payment": payment.to_dict()}), 200
+        body, status = run_group_write(group_id, lambda group: stage_new_payment(group, data))
+        return jsonify(body), status
 
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -48,10 +36,27 @@ def add_payment(group_id):
         return jsonify({"message": "An unexpected error occurred", "error": str(e)}), 500
 
 
+def stage_new_payment(group, data):
+    # Everything add_payment writes, short of the commit; run_group_write may batch it with other writes
+    if not validate_usernames(group, data):
+        return {"message": "Invalid username(s) in the transaction"}, 400
+
+    payment_data = process_payment_data(data)
+    payment = Payment(group_id=group.id, **payment_data)
+    db.session.add(payment)
+
+    # Apply the balance change atomically in the database
+    deltas = payment_balance_deltas(payment, 'add')
+    apply_balance_deltas(group, deltas)
+    record_event(group, 'payment', 'add', payment, deltas)
+    return {"message": "Payment added", "payment": payment.to_dict()}, 200
+
+
 @bp.route('/group/<int:group_id>/payment/<int:payment_id>', methods=['PUT'])
 def update_payment(group_id, payment_id):
     try:
-        group = Group.query.get(group_id)
+        # Locked before the row is read, so concurrent edits of it apply their deltas one after another
+        group = Group.query.with_for_update().filter_by(id=group_id).first()
         payment = Payment.query.filter_by(id=payment_id, group_id=group_id).first()
 
         if not group or not payment:
@@ -74,12 +79,10 @@ def update_payment(group_id, payment_id):
             if value is not None:  
                 setattr(payment, key, value)
 
-        # Update balances and get new settlements
-        updated_balances = update_balances_payment(group.balances or {}, payment, 'update', old_paid_from, old_paid_to, old_payment_amount)
-
-        # Update the group with new balances and commit
-        group.balances = updated_balances
-        flag_modified(group,"balances")
+        # Apply the balance change atomically in the database
+        deltas = payment_balance_deltas(payment, 'update', old_paid_from, old_paid_to, old_payment_amount)
+        apply_balance_deltas(group, deltas)
+        record_event(group, 'payment', 'update', payment, deltas)
         db.session.commit()
 
         return jsonify({"message": "Payment updated", "payment": payment.to_dict()}), 200
@@ -95,7 +98,8 @@ def update_payment(group_id, payment_id):
 @bp.route('/group/<int:group_id>/payment/<int:payment_id>', methods=['DELETE'])
 def delete_payment(group_id, payment_id):
     try:
-        group = Group.query.get(group_id)
+        # Locked before the row is read, so concurrent edits of it apply their deltas one after another
+        group = Group.query.with_for_update().filter_by(id=group_id).first()
         payment = Payment.query.filter_by(id=payment_id, group_id=group_id).first()
 
         if not group or not payment:
@@ -103,12 +107,10 @@ def delete_payment(group_id, payment_id):
 
         db.session.delete(payment)
 
-        # Update balances and get new settlements
-        updated_balances = update_balances_payment(group.balances or {}, payment, 'delete')
-
-        # Update the group with new balances and commit
-        group.balances = updated_balances
-        flag_modified(group,"balances")
+        # Apply the balance change atomically in the database
+        deltas = payment_balance_deltas(payment, 'delete')
+        apply_balance_deltas(group, deltas)
+        record_event(group, 'payment', 'delete', payment, deltas)
         db.session.commit()
 
         return jsonify({"message": "Payment deleted", "payment": payment.to_dict()}), 200
@@ -121,6 +123,8 @@ def delete_payment(group_id, payment_id):
         return jsonify({"message": "An unexpected error occurred", "error": str(e)}), 500
 
 @bp.route('/group/<int:group_id>/payment/<int:payment_id>', methods=['GET'])
+@read_only
+@versioned
 def get_payment(group_id, payment_id):
     group=Group.query.get(group_id)
     if not group:
@@ -128,4 +132,73 @@ def get_payment(group_id, payment_id):
     payment=Payment.query.filter_by(id=payment_id,group_id=group_id).first()
     if not payment:
         return jsonify({"message": "Payment not found"}), 404
-    return jsonify({"payment":payment.to_dict()}),200
\ No newline at end of file
+    return jsonify({"payment":payment.to_dict()}),200
+
+
+def settlement_etags(group_id, version, mode):
+    # The tags GET settlements gives this plan; greedy is also what it returns without a mode
+    query_strings = [f'mode={mode}'.encode()] + ([b''] if mode == GREEDY else [])
+    return [etag_for(group_id, version, query_string, representation)
+            for query_string in query_strings for representation in ('', '-msgpack')]
+
+
+@bp.route('/group/<int:group_id>/settle', methods=['POST'])
+def settle_all(group_id):
+    try:
+        data = request.get_json(silent=True) or {}
+        mode = data.get('mode', GREEDY)
+        if mode not in SETTLEMENT_MODES:
+            return jsonify({"message": f"Invalid mode. Choose one of: {', '.join(SETTLEMENT_MODES)}"}), 400
+
+        if not request.if_match and data.get('version') is None:
+            return jsonify({"message": "Send If-Match with the settlements ETag or the group version in the body"}), 428
+
+        # Held until the commit, so no write can land between the version check and the payments
+        group = Group.query.with_for_update().filter_by(id=group_id).first()
+        if not group:
+            return jsonify({"message": "Group not found"}), 404
+        # The whole tag is compared, so a plan shown for another mode doesn't match either
+        if request.if_match:
+            if not any(request.if_match.contains_weak(etag) for etag in settlement_etags(group_id, group.version, mode)):
+                db.session.rollback()
+                return jsonify({"message": "Group or settlement mode changed since the settlement plan was computed",
+                                "version": group.version}), 412
+        elif group.version != data['version']:
+            db.session.rollback()
+            return jsonify({"message": "Group changed since the settlement plan was computed",
+                            "version": group.version}), 409
+
+        balances = group.balances or {}
+        settlements = settle_up(balances, mode, current_app.config['SETTLEMENT_TIME_BUDGET'])
+        zeroed = sorted(username for username, balance in balances.items() if balance)
+        if not zeroed:
+            db.session.rollback()
+            return jsonify({"message": "Nothing to settle", "payments": []}), 200
+
+        payments = []
+        if settlements:
+            now = datetime.now()
+            rows = [{'group_id': group_id, 'amount': settlement['amount'], 'paid_from': settlement['debtor'],
+                     'paid_to': settlement['creditor'], 'datetime_payment': now} for settlement in settlements]
+            payments = db.session.execute(insert(Payment).returning(Payment, sort_by_parameter_order=True), rows).scalars().all()
+
+        # Every payment folds into one balance update, one version and one ledger event; the
+        # update also sets every balance to exactly 0, sub-cent residue included
+        deltas = {}
+        for payment in payments:
+            for username, delta in payment_balance_deltas(payment, 'add').items():
+                deltas[username] = deltas.get(username, 0) + delta
+        write_balance_deltas(group, {username: delta for username, delta in deltas.items() if delta}, 1, zeroed)
+        record_event(group, 'settlement', 'add', deltas=deltas,
+                     payload={'payments': len(payments), 'mode': mode, 'zeroed': zeroed})
+        db.session.commit()
+
+        return jsonify({"message": "Group settled", "version": group.version,
+                        "payments": [payment.to_dict() for payment in payments]}), 200
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"message": "Database error occurred", "error": str(e)}), 500
+
+    except Exception as e:
+        return jsonify({"message": "An unexpected error occurred", "error": str(e)}), 500
@@ -0,0 +1,99 @@
+import os
+import uuid
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy.exc import SQLAlchemyError
+from backend.db import db
+from backend.models.group import Group
+from backend.models.receipt_job import ReceiptJob
+from backend.helper.ocr import receipt_jobs, QueueFullError, discard_image
+from backend.helper.split import split_bill, SplitError, ITEMIZED
+
+bp = Blueprint('receipts', __name__)
+
+@bp.route('/group/<int:group_id>/receipts', methods=['POST'])
+def submit_receipt(group_id):
+    group = Group.query.get(group_id)
+    if not group:
+        return jsonify({"message": "Group not found"}), 404
+
+    image = request.files.get('image')
+    if not image or not image.filename:
+        return jsonify({"message": "An image file is required"}), 400
+
+    upload_dir = current_app.config['OCR_UPLOAD_DIR']
+    os.makedirs(upload_dir, exist_ok=True)
+    extension = os.path.splitext(image.filename)[1].lower()[:10]
+    image_path = os.path.join(upload_dir, f"{uuid.uuid4().hex}{extension}")
+
+    try:
+        image.save(image_path)
+        job = ReceiptJob(group_id=group_id, image_path=image_path, status='queued')
+        db.session.add(job)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"message": "Database error occurred", "error": str(e)}), 500
+
+    try:
+        receipt_jobs.submit(job.id, image_path)
+    except QueueFullError:
+        job.status = 'failed'
+        job.error = "Receipt queue is full"
+        db.session.commit()
+        discard_image(image_path)
+        return jsonify({"message": "Too many receipts are being processed, try again later", "job": job.to_dict()}), 503
+
+    return jsonify({"message": "Receipt queued", "job": job.to_dict()}), 202
+
+@bp.route('/group/<int:group_id>/receipts/<int:job_id>', methods=['GET'])
+def get_receipt_job(group_id, job_id):
+    job = ReceiptJob.query.filter_by(id=job_id, group_id=group_id).first()
+    if not job:
+        return jsonify({"message": "Receipt job not found"}), 404
+    return jsonify({"job": job.to_dict()}), 200
+
+@bp.route('/group/<int:group_id>/receipts/<int:job_id>/draft', methods=['POST'])
+def draft_transaction(group_id, job_id):
+    group = Group.query.get(group_id)
+    job = ReceiptJob.query.filter_by(id=job_id, group_id=group_id).first()
+    if not group or not job:
+        return jsonify({"message": "Group or Receipt job not found"}), 404
+    if job.status != 'done':
+        return jsonify({"message": f"Receipt job is {job.status}"}), 409
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"message": "Invalid data"}), 400
+    usernames = [user['username'] for user in group.usernames]
+    payer = data.get('paid_by')
+    if payer not in usernames:
+        return jsonify({"message": "paid_by must be a group member"}), 400
+
+    # Items go to everyone unless the caller assigns them: {"assignments": {"<item index>": [usernames]}}
+    assignments = data.get('assignments', {})
+    if not isinstance(assignments, dict) or any(
+            not isinstance(members, list) or not all(isinstance(member, str) for member in members)
+            for members in assignments.values()):
+        return jsonify({"message": "assignments must map item indexes to lists of usernames"}), 400
+    items = [{'amount': item['amount'], 'members': assignments.get(str(index), usernames)}
+             for index, item in enumerate(job.result['items'])]
+    if any(not set(item['members']) <= set(usernames) for item in items):
+        return jsonify({"message": "Invalid username(s) in the assignments"}), 400
+
+    split = {'mode': ITEMIZED, 'items': items, 'tax': job.result.get('tax', 0), 'discount': job.result.get('discount', 0)}
+    try:
+        amount, share_details = split_bill(split)
+    except SplitError as e:
+        return jsonify({"message": str(e)}), 400
+
+    # Not persisted: the client reviews the draft and posts it to /transaction
+    draft = {
+        'description': data.get('description', 'Receipt'),
+        'amount': amount,
+        'paid_by': [{'username': payer, 'amount': amount}],
+        'mode': ITEMIZED,
+        'paid_for': [share['username'] for share in share_details],
+        'share_details': share_details,
+        'split': split
+    }
+    return jsonify({"transaction": draft}), 200
@@ -3,9 +3,17 @@ from backend.db import db
 from backend.models.transaction import Transaction
 from backend.websocket import socketio
 from backend.models.group import Group
-from backend.helper.helper import update_balances_transaction,validate_usernames,process_transaction_data
+from backend.helper.helper import validate_usernames,process_transaction_data
+from backend.helper.balances import transaction_balance_deltas, apply_balance_deltas
+from backend.helper.totals import transaction_total_deltas, apply_member_totals
+from backend.helper.entries import write_transaction_entries, delete_transaction_entries
+from backend.helper.rollups import apply_spending_rollup
+from backend.helper.ledger import record_event
+from backend.helper.split import split_bill, expand_split, amounts_match, SplitError
+from backend.helper.versioning import bump_group_version, versioned
+from backend.helper.replicas import read_only
+from backend.helper.write_batching import run_group_write
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm.attributes import flag_modified
 
 
 bp = Blueprint('transactions', __name__)
@@ -13,30 +21,9 @@ bp = Blueprint('transactions', __name__)
 @bp.route('/group/<int:group_id>/transaction', methods=['POST'])
 def add_transaction(group_id):
     try:
-        group = Group.query.get(group_id)
-        if not group:
-            return jsonify({"message": "Group not found"}), 404
-        
         data = request.get_json()
-        if not validate_usernames(group, data):
-            return jsonify({"message": "Invalid username(s) in the transaction"}), 400
-
-        # Validate that the total amount paid matches the transaction amount
-        total_paid = sum(payer['amount'] for payer in data['paid_by'])
-        total_shared = sum(share['amount'] for share in data['share_details'])
-        if total_paid != data['amount'] or total_shared != data['amount']:
-            return jsonify({"message": "Total amount paid or shared does not match the transaction amount"}), 400
-
-        transaction_data = process_transaction_data(data)
-        transaction = Transaction(group_id=group_id, **transaction_data)
-        db.session.add(transaction)
-
-        updated_balances = update_balances_transaction(group.balances or {}, transaction, 'add')
-        group.balances = updated_balances
-        flag_modified(group,"balances")
-        db.session.commit()
-
-        return jsonify({"message": "Transaction added", "transaction": transaction.to_dict()}), 200
+        body, status = run_group_write(group_id, lambda group: stage_new_transaction(group, data))
+        return jsonify(body), status
 
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -45,10 +32,38 @@ def add_transaction(group_id):
         return jsonify({"message": "An unexpected error occurred", "error": str(e)}), 500
 
 
+def stage_new_transaction(group, data):
+    # Everything add_transaction writes, short of the commit; run_group_write may batch it with other writes
+    try:
+        expand_split(data)
+    except SplitError as e:
+        return {"message": str(e)}, 400
+
+    if not validate_usernames(group, data):
+        return {"message": "Invalid username(s) in the transaction"}, 400
+
+    # Validate that the total amount paid matches the transaction amount
+    if not amounts_match(data['amount'], data['paid_by']) or not amounts_match(data['amount'], data['share_details']):
+        return {"message": "Total amount paid or shared does not match the transaction amount"}, 400
+
+    transaction_data = process_transaction_data(data)
+    transaction = Transaction(group_id=group.id, **transaction_data)
+    db.session.add(transaction)
+
+    deltas = transaction_balance_deltas(transaction, 'add')
+    apply_balance_deltas(group, deltas)
+    apply_member_totals(group.id, transaction_total_deltas(transaction, 'add'))
+    write_transaction_entries(transaction)
+    apply_spending_rollup([transaction.id], 1)
+    record_event(group, 'transaction', 'add', transaction, deltas)
+    return {"message": "Transaction added", "transaction": transaction.to_dict()}, 200
+
+
 @bp.route('/group/<int:group_id>/transaction/<int:transaction_id>', methods=['PUT'])
 def update_transaction(group_id, transaction_id):
     try:
-        group = Group.query.get(group_id)
+        # Locked before the row is read, so concurrent edits of it apply their deltas one after another
+        group = Group.query.with_for_update().filter_by(id=group_id).first()
         transaction = Transaction.query.filter_by(id=transaction_id, group_id=group_id).first()
         if not group or not transaction:
             return jsonify({"message": "Group or Transaction not found"}), 404
@@ -58,17 +73,27 @@ def update_transaction(group_id, transaction_id):
         # Check if only datetime or is_saved is being updated
         if set(data.keys()).issubset({'datetime_transaction', 'is_saved','description'}):
             if 'datetime_transaction' in data:
+                # Moving the transaction to another day moves its spending rollup with it
+                apply_spending_rollup([transaction.id], -1)
                 transaction.datetime_transaction = data['datetime_transaction']
+                apply_spending_rollup([transaction.id], 1)
             if 'is_saved' in data:
                 transaction.is_saved = data['is_saved']
             if 'description' in data:
                 transaction.description=data['description']
+            bump_group_version(group)
+            record_event(group, 'transaction', 'update', transaction)
             
             db.session.commit()
     
             return jsonify({"message": "Transaction updated"}), 200
 
         # For other updates, proceed with full validation
+        try:
+            expand_split(data)
+        except SplitError as e:
+            return jsonify({"message": str(e)}), 400
+
         if not validate_usernames(group, data):
             return jsonify({"message": "Invalid username(s) in the transaction update"}), 400
 
@@ -79,21 +104,22 @@ def update_transaction(group_id, transaction_id):
         new_paid_by = data.get('paid_by', transaction.paid_by)
         new_share_details = data.get('share_details', transaction.share_details)
         
-        total_paid = sum(payer['amount'] for payer in new_paid_by)
-        total_shared = sum(share['amount'] for share in new_share_details)
-        
-        if total_paid != new_amount or total_shared != new_amount:
+        if not amounts_match(new_amount, new_paid_by) or not amounts_match(new_amount, new_share_details):
             return jsonify({"message": "Total amount paid or shared does not match the transaction amount"}), 400
 
+        apply_spending_rollup([transaction.id], -1)
         updated_data = process_transaction_data(data, transaction)
         for key, value in updated_data.items():
             if value is not None:  # Only update fields that are provided
                 setattr(transaction, key, value)
 
 
-        updated_balances = update_balances_transaction(group.balances or {}, transaction, 'update', old_share_details, old_paid_by)
-        group.balances = updated_balances
-        flag_modified(group,"balances")
+        deltas = transaction_balance_deltas(transaction, 'update', old_share_details, old_paid_by)
+        apply_balance_deltas(group, deltas)
+        apply_member_totals(group_id, transaction_total_deltas(transaction, 'update', old_share_details, old_paid_by))
+        write_transaction_entries(transaction, replace=True)
+        apply_spending_rollup([transaction.id], 1)
+        record_event(group, 'transaction', 'update', transaction, deltas)
         db.session.commit()
 
         return jsonify({"message": "Transaction updated", "transaction": transaction.to_dict()}), 200
@@ -107,19 +133,22 @@ def update_transaction(group_id, transaction_id):
 @bp.route('/group/<int:group_id>/transaction/<int:transaction_id>', methods=['DELETE'])
 def delete_transaction(group_id, transaction_id):
     try:
-        group = Group.query.get(group_id)
+        # Locked before the row is read, so concurrent edits of it apply their deltas one after another
+        group = Group.query.with_for_update().filter_by(id=group_id).first()
         if not group:
             return jsonify({"message": "Group not found"}), 404 
         transaction = Transaction.query.filter_by(id=transaction_id, group_id=group_id).first()
         if not transaction:
             return jsonify({"message": "Transaction not found"}), 404
 
+        apply_spending_rollup([transaction.id], -1)
         db.session.delete(transaction)
+        delete_transaction_entries(transaction)
 
-        updated_balances = update_balances_transaction(group.balances or {}, transaction, 'delete')
-
-        group.balances = updated_balances
-        flag_modified(group,"balances")
+        deltas = transaction_balance_deltas(transaction, 'delete')
+        apply_balance_deltas(group, deltas)
+        apply_member_totals(group_id, transaction_total_deltas(transaction, 'delete'))
+        record_event(group, 'transaction', 'delete', transaction, deltas)
         db.session.commit()
 
         return jsonify({"message": "Transaction deleted", "transaction": transaction.to_dict()}), 200
@@ -132,6 +161,8 @@ def delete_transaction(group_id, transaction_id):
         return jsonify({"message": "An unexpected error occurred", "error": str(e)}), 500
 
 @bp.route('/group/<int:group_id>/transaction/<int:transaction_id>', methods=['GET'])
+@read_only
+@versioned
 def get_transaction(group_id, transaction_id):
     group=Group.query.get(group_id)
     if not group:
@@ -139,4 +170,19 @@ def get_transaction(group_id, transaction_id):
     transaction=Transaction.query.filter_by(id=transaction_id,group_id=group_id).first()
     if not transaction:
         return jsonify({"message": "Transaction not found"}), 404
-    return jsonify({"transaction":transaction.to_dict()}),200
\ No newline at end of file
+    return jsonify({"transaction":transaction.to_dict()}),200
+
+@bp.route('/group/<int:group_id>/split', methods=['POST'])
+def preview_split(group_id):
+    group = Group.query.get(group_id)
+    if not group:
+        return jsonify({"message": "Group not found"}), 404
+
+    try:
+        amount, share_details = split_bill(request.get_json())
+    except SplitError as e:
+        return jsonify({"message": str(e)}), 400
+
+    if not validate_usernames(group, {'share_details': share_details}):
+        return jsonify({"message": "Invalid username(s) in the split"}), 400
+    return jsonify({"amount": amount, "share_details": share_details}), 200
@@ -0,0 +1,18 @@
+from flask import Blueprint, request, jsonify
+from backend.helper.memberships import load_positions, LOOKUP_COLUMNS
+from backend.helper.replicas import read_only
+
+bp = Blueprint('users', __name__)
+
+@bp.route('/user/<string:identifier>/positions', methods=['GET'])
+@read_only
+def get_user_positions(identifier):
+    # Net position across every group the user belongs to; ?by=username (default) or ?by=upi_id
+    by = request.args.get('by', 'username')
+    if by not in LOOKUP_COLUMNS:
+        return jsonify({"message": f"Invalid by. Choose one of: {', '.join(LOOKUP_COLUMNS)}"}), 400
+
+    positions = load_positions(identifier, by)
+    if not positions['groups']:
+        return jsonify({"message": "User not found in any group"}), 404
+    return jsonify({"user": identifier, "by": by, **positions}), 200
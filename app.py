@@ -2,22 +2,48 @@ from flask import Flask
 from backend.config import Config
 from backend.db import db
 from backend.migrate import migrate
-from backend.websocket import socketio
+from backend.websocket import socketio, init_websocket
 from backend.api.groups import bp as groups_bp
 from backend.api.transactions import bp as transactions_bp
 from backend.api.payments import bp as payments_bp
+from backend.api.imports import bp as imports_bp
+from backend.api.exports import bp as exports_bp
+from backend.api.cache import bp as cache_bp
+from backend.api.receipts import bp as receipts_bp
+from backend.api.users import bp as users_bp
+from backend.helper.ocr import receipt_jobs
+from backend.helper.write_batching import write_batcher
+from backend.api.metrics import bp as metrics_bp
+from backend.helper.metrics import init_metrics
+from backend.helper.group_cache import init_group_cache
+from backend.helper.replicas import init_replicas
+from backend.helper.serialization import init_serialization
+from backend.commands import register_commands
 from flask_cors import CORS
 def create_app():
     app = Flask(__name__)
     CORS(app)
     app.config.from_object(Config)
+    init_serialization(app)
     db.init_app(app)
     migrate.init_app(app, db)
-    socketio.init_app(app)
+    init_replicas(app)
+    init_websocket(app)
+    init_group_cache(app)
+    receipt_jobs.init_app(app)
+    write_batcher.init_app(app)
+    init_metrics(app)
     
     app.register_blueprint(groups_bp, url_prefix='/api')
     app.register_blueprint(transactions_bp, url_prefix='/api')
     app.register_blueprint(payments_bp, url_prefix='/api')
+    app.register_blueprint(imports_bp, url_prefix='/api')
+    app.register_blueprint(exports_bp, url_prefix='/api')
+    app.register_blueprint(cache_bp, url_prefix='/api')
+    app.register_blueprint(receipts_bp, url_prefix='/api')
+    app.register_blueprint(users_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp)
+    register_commands(app)
 
     return app
 
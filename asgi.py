@@ -0,0 +1,146 @@
+# Production entry point on an async stack:
+#   uvicorn backend.asgi:app --workers 4
+# Socket.IO is served by python-socketio's AsyncServer, the read endpoints of api/groups.py by
+# the native handlers in api/async_reads.py over asyncpg, and everything else by the Flask app
+# through asgiref's WsgiToAsgi (in a thread pool, so slow writes don't block the event loop).
+import asyncio
+import random
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl
+
+import socketio
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from werkzeug.datastructures import MultiDict
+
+from backend.app import create_app
+from backend.api.async_reads import match_route, load_group, not_found
+from backend.helper.metrics import metrics
+from backend.helper.replicas import STICKY_COOKIE, sticky_cookie_active
+from backend.helper.versioning import etag_for
+from backend.helper.serialization import JSON_ENCODERS, json_backend, prefers_msgpack
+from backend.websocket import coalescer, group_room
+
+
+def async_engine(url, config):
+    # Same pool settings as the Flask engines; statement_timeout goes through asyncpg's server_settings
+    options = {key: value for key, value in config['SQLALCHEMY_ENGINE_OPTIONS'].items() if key != 'connect_args'}
+    options['connect_args'] = {'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}}
+    return create_async_engine(make_url(url).set(drivername='postgresql+asyncpg'), **options)
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix('W/').strip('"') for tag in header.decode('latin-1').split(',')]
+    return '*' in tags or etag in tags
+
+
+class AsyncReadApp:
+    # Routes GETs for the async read endpoints to their handlers and passes everything else on
+
+    def __init__(self, flask_app):
+        self.config = flask_app.config
+        self.encode = JSON_ENCODERS[json_backend(self.config['JSON_BACKEND'])]
+        self.fallback = WsgiToAsgi(flask_app)
+        self.primary = async_engine(self.config['SQLALCHEMY_DATABASE_URI'], self.config)
+        self.replicas = [async_engine(url, self.config) for url in self.config['DATABASE_REPLICA_URLS']]
+
+    def engine_for(self, headers):
+        if not self.replicas:
+            return self.primary
+        cookie = SimpleCookie(headers.get(b'cookie', b'').decode('latin-1'))
+        if STICKY_COOKIE in cookie and sticky_cookie_active(cookie[STICKY_COOKIE].value):
+            return self.primary
+        return random.choice(self.replicas)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD') and not self.wants_msgpack(scope):
+            route = match_route(scope['path'])
+            if route:
+                return await self.serve(scope, send, *route)
+        await self.fallback(scope, receive, send)
+
+    def wants_msgpack(self, scope):
+        # MessagePack responses are negotiated by the Flask views
+        accept = next((value for name, value in scope['headers'] if name == b'accept'), b'')
+        return prefers_msgpack(accept.decode('latin-1'))
+
+    async def serve(self, scope, send, name, handler, group_id):
+        start = time.perf_counter()
+        headers = dict(scope['headers'])
+        args = MultiDict(parse_qsl(scope['query_string'].decode(), keep_blank_values=True))
+        response_headers = [(b'content-type', b'application/json'), (b'access-control-allow-origin', b'*')]
+
+        async with AsyncSession(self.engine_for(headers)) as session:
+            group = await load_group(session, group_id)
+            if group is None:
+                body, status = not_found()
+            else:
+                etag = etag_for(group_id, group['version'], scope['query_string'])
+                if etag_matches(headers.get(b'if-none-match'), etag):
+                    body, status = None, 304
+                else:
+                    body, status = await handler(session, group, args, self.config)
+                if status in (200, 304):
+                    response_headers.append((b'etag', f'W/"{etag}"'.encode()))
+
+        payload = b'' if body is None else self.encode(body)
+        response_headers.append((b'content-length', str(len(payload)).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': payload if scope['method'] == 'GET' else b''})
+
+        labels = (('endpoint', f'async.{name}'), ('method', scope['method']))
+        metrics.observe('splitter_request_duration_seconds', labels, time.perf_counter() - start)
+        metrics.inc('splitter_requests_total', labels + (('status', status),))
+
+    async def close(self):
+        for engine in [self.primary, *self.replicas]:
+            await engine.dispose()
+
+
+def socketio_server(config):
+    # Several workers need a shared queue; Flask-SocketIO publishes the Flask side's events to it
+    url = config['SOCKETIO_MESSAGE_QUEUE']
+    if not url:
+        manager = None
+    elif url.startswith(('redis://', 'rediss://')):
+        manager = socketio.AsyncRedisManager(url)
+    elif url.startswith('amqp://'):
+        manager = socketio.AsyncAioPikaManager(url)
+    else:
+        raise RuntimeError(f"SOCKETIO_MESSAGE_QUEUE {url!r} is not supported by the async server; use redis:// or amqp://")
+    sio = socketio.AsyncServer(async_mode='asgi', client_manager=manager, cors_allowed_origins='*')
+
+    @sio.on('join')
+    async def on_join(sid, data):
+        await sio.enter_room(sid, group_room(int(data['group_id'])))
+
+    @sio.on('leave')
+    async def on_leave(sid, data):
+        await sio.leave_room(sid, group_room(int(data['group_id'])))
+
+    return sio
+
+
+def create_asgi_app():
+    flask_app = create_app()
+    reads = AsyncReadApp(flask_app)
+    sio = socketio_server(flask_app.config)
+
+    async def on_startup():
+        if not flask_app.config['SOCKETIO_MESSAGE_QUEUE']:
+            # Single process: hand the Flask side's coalesced events straight to the async server
+            loop = asyncio.get_running_loop()
+            coalescer.emitter = lambda event, data, to: asyncio.run_coroutine_threadsafe(sio.emit(event, data, to=to), loop)
+
+    return socketio.ASGIApp(sio, other_asgi_app=reads, on_startup=on_startup, on_shutdown=reads.close)
+
+
+app = create_asgi_app()
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=5000)
@@ -0,0 +1,104 @@
+# Endpoint benchmarks through the Flask test client against a local postgres database.
+# Seeds one group per size through the bulk import endpoint, then times the read endpoints
+# and single writes. Tables are created if missing; use a scratch database:
+#   DATABASE_URL=postgresql://... python -m backend.benchmarks.bench_endpoints --transactions 1000,50000
+# Set CACHE_ENABLED=false to time the uncached read path.
+import argparse
+import random
+
+from backend.app import create_app
+from backend.db import db
+from backend.benchmarks.common import measure, summarize, report, add_baseline_arguments
+
+SUITE = 'endpoints'
+IMPORT_CHUNK = 10000
+
+READ_ENDPOINTS = (
+    'usernames', 'balances', 'settlements', 'total_expenditure', 'user_expenditure',
+    'transactions?limit=50', 'payments?limit=50', 'transactions'
+)
+
+
+def import_rows(member_count, count, rng):
+    members = [f"user{i}" for i in range(member_count)]
+    for _ in range(count):
+        involved = rng.sample(members, min(4, member_count))
+        if rng.random() < 0.8:
+            amount = rng.randint(1, 500) * len(involved)
+            yield {
+                'type': 'transaction', 'description': 'Seeded', 'amount': amount,
+                'paid_by': [{'username': involved[0], 'amount': amount}],
+                'split': {'mode': 'equal', 'amount': amount, 'members': involved}
+            }
+        else:
+            yield {'type': 'payment', 'amount': rng.randint(1, 500), 'paid_from': involved[0], 'paid_to': involved[1]}
+
+
+def seed_group(client, member_count, transaction_count, rng):
+    response = client.post('/api/group', json={
+        'name': f'bench {member_count}x{transaction_count}',
+        'usernames': [{'username': f"user{i}"} for i in range(member_count)]
+    })
+    group_id = response.get_json()['group']['id']
+
+    chunk = []
+    for row in import_rows(member_count, transaction_count, rng):
+        chunk.append(row)
+        if len(chunk) == IMPORT_CHUNK:
+            checked(client.post(f'/api/group/{group_id}/import', json=chunk))
+            chunk = []
+    if chunk:
+        checked(client.post(f'/api/group/{group_id}/import', json=chunk))
+    return group_id
+
+
+def checked(response):
+    if response.status_code >= 400:
+        raise SystemExit(f"Benchmark request failed ({response.status_code}): {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+def bench_group(client, member_count, transaction_count, runs, rng):
+    group_id = seed_group(client, member_count, transaction_count, rng)
+    base = f'/api/group/{group_id}'
+    label = f"m={member_count} t={transaction_count}"
+    results = {}
+
+    for endpoint in READ_ENDPOINTS:
+        results[f"GET {endpoint} {label}"] = summarize(measure(lambda: checked(client.get(f'{base}/{endpoint}')), runs))
+
+    members = [f"user{i}" for i in range(min(member_count, 4))]
+    results[f"POST transaction {label}"] = summarize(measure(lambda: checked(client.post(f'{base}/transaction', json={
+        'description': 'Bench', 'amount': 40.0, 'paid_by': [{'username': members[0], 'amount': 40.0}],
+        'split': {'mode': 'equal', 'amount': 40.0, 'members': members}
+    })), runs))
+    results[f"POST payment {label}"] = summarize(measure(lambda: checked(client.post(f'{base}/payment', json={
+        'amount': 10.0, 'paid_from': members[0], 'paid_to': members[1]
+    })), runs))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--members', default='10,100')
+    parser.add_argument('--transactions', default='1000,20000')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=7)
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+
+    results = {}
+    for member_count in (int(size) for size in args.members.split(',')):
+        for transaction_count in (int(size) for size in args.transactions.split(',')):
+            results.update(bench_group(client, member_count, transaction_count, args.runs, rng))
+    report(results, SUITE, args)
+
+
+if __name__ == '__main__':
+    main()
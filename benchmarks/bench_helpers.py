@@ -0,0 +1,97 @@
+# Micro-benchmarks for every function in helper/helper.py over synthetic groups.
+# No database needed; transactions are plain objects shaped like the models.
+#   python -m backend.benchmarks.bench_helpers --members 10,1000,10000 --transactions 1000,1000000
+#   python -m backend.benchmarks.bench_helpers --check        # compare against baselines.json
+import argparse
+import random
+from types import SimpleNamespace
+
+from backend.benchmarks.common import measure, summarize, report, add_baseline_arguments
+from backend.helper.helper import (
+    update_balances_transaction, update_balances_payment, calculate_user_expenditures,
+    validate_usernames, process_transaction_data, process_payment_data, settle_up
+)
+
+SUITE = 'helpers'
+
+
+def synthetic_transaction(members, rng, participants=4):
+    involved = rng.sample(members, min(participants, len(members)))
+    amount = rng.randint(1, 1000) * len(involved)
+    share = amount / len(involved)
+    return SimpleNamespace(
+        amount=amount,
+        paid_by=[{'username': involved[0], 'amount': amount}],
+        paid_for=involved,
+        share_details=[{'username': username, 'amount': share} for username in involved],
+        mode='equal',
+        datetime_transaction=None,
+        is_saved=False,
+        description='Synthetic'
+    )
+
+
+def synthetic_group(member_count, transaction_count, rng):
+    members = [f"user{i}" for i in range(member_count)]
+    transactions = [synthetic_transaction(members, rng) for _ in range(transaction_count)]
+    balances = {member: 0 for member in members}
+    for transaction in transactions:
+        update_balances_transaction(balances, transaction, 'add')
+    group = SimpleNamespace(usernames=[{'username': member} for member in members], balances=balances)
+    return members, transactions, group
+
+
+def bench_group(member_count, transaction_count, runs, rng):
+    members, transactions, group = synthetic_group(member_count, transaction_count, rng)
+    transaction = transactions[0]
+    payment = SimpleNamespace(amount=125.5, paid_from=members[0], paid_to=members[-1], datetime_payment=None)
+    request = {
+        'paid_by': transaction.paid_by,
+        'paid_for': transaction.paid_for,
+        'share_details': transaction.share_details,
+        'paid_from': members[0],
+        'paid_to': members[-1]
+    }
+    label = f"m={member_count} t={transaction_count}"
+
+    def replay():
+        balances = {}
+        for item in transactions:
+            update_balances_transaction(balances, item, 'add')
+
+    return {
+        f"update_balances_transaction add x{transaction_count} {label}": summarize(measure(replay, runs)),
+        f"update_balances_transaction update {label}": summarize(measure(
+            lambda: update_balances_transaction(dict(group.balances), transaction, 'update',
+                                                transaction.share_details, transaction.paid_by), runs)),
+        f"update_balances_payment add {label}": summarize(measure(
+            lambda: update_balances_payment(dict(group.balances), payment, 'add'), runs)),
+        f"calculate_user_expenditures {label}": summarize(measure(
+            lambda: calculate_user_expenditures(transactions), runs)),
+        f"validate_usernames {label}": summarize(measure(lambda: validate_usernames(group, request), runs)),
+        f"process_transaction_data {label}": summarize(measure(
+            lambda: process_transaction_data(request, transaction), runs)),
+        f"process_payment_data {label}": summarize(measure(lambda: process_payment_data(request, payment), runs)),
+        f"settle_up {label}": summarize(measure(lambda: settle_up(group.balances), runs)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--members', default='10,100,1000,10000')
+    parser.add_argument('--transactions', default='1000,100000', help='up to 1000000; memory grows linearly')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    results = {}
+    for member_count in (int(size) for size in args.members.split(',')):
+        for transaction_count in (int(size) for size in args.transactions.split(',')):
+            results.update(bench_group(member_count, transaction_count, args.runs, rng))
+    report(results, SUITE, args)
+
+
+if __name__ == '__main__':
+    main()
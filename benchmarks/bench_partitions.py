@@ -0,0 +1,89 @@
+# Before/after comparison for monthly partitioning plus archival of old history. Fills a scratch
+# database with synthetic transactions spread over --months, records plans and timings of the hot
+# history queries, runs the partition migration and the archive job, then measures again.
+# Drops and recreates every table; never point it at real data:
+#   DATABASE_URL=postgresql://.../scratch python -m backend.benchmarks.bench_partitions --rows 2000000
+import argparse
+
+from sqlalchemy import text
+
+from backend.app import create_app
+from backend.db import db
+from backend.benchmarks.common import measure, summarize
+from backend.helper.partitions import partition_history_table, archive_history
+
+HOT_QUERIES = {
+    'latest page': """SELECT id, datetime_transaction, amount FROM transactions WHERE group_id = :group_id
+                      ORDER BY datetime_transaction DESC, id DESC LIMIT 50""",
+    'last 30 days': """SELECT id, amount FROM transactions WHERE group_id = :group_id
+                       AND datetime_transaction >= now() - interval '30 days'""",
+    'last 90 days total': """SELECT sum(amount) FROM transactions WHERE group_id = :group_id
+                             AND datetime_transaction >= now() - interval '90 days'""",
+}
+
+SEED_TRANSACTIONS_SQL = """
+INSERT INTO transactions (group_id, description, amount, paid_by, mode, paid_for, share_details, datetime_transaction, is_saved)
+SELECT 1 + i % :groups, 'Synthetic ' || i, 1 + i % 500,
+       jsonb_build_array(jsonb_build_object('username', 'user' || i % 5, 'amount', 1 + i % 500)),
+       'equal', jsonb_build_array('user' || i % 5),
+       jsonb_build_array(jsonb_build_object('username', 'user' || i % 5, 'amount', 1 + i % 500)),
+       now() - (random() * :months * interval '30 days'), false
+FROM generate_series(1, :rows) AS i
+"""
+
+
+def seed(rows, groups, months):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(text("SET LOCAL statement_timeout = 0"))
+    db.session.execute(text("INSERT INTO groups (name, usernames, balances, version) "
+                            "SELECT 'group ' || i, '[]', '{}', 0 FROM generate_series(1, :groups) AS i"), {'groups': groups})
+    db.session.execute(text(SEED_TRANSACTIONS_SQL), {'rows': rows, 'groups': groups, 'months': months})
+    db.session.commit()
+    db.session.execute(text("ANALYZE"))
+
+
+def hot_index_size():
+    # Indexes of transactions and of every partition still attached to it
+    return db.session.execute(text("""
+        SELECT pg_size_pretty(coalesce((SELECT sum(pg_indexes_size(relid)) FROM pg_partition_tree('transactions')),
+                                       pg_indexes_size('transactions')))
+    """)).scalar()
+
+
+def report_phase(label, group_id, runs):
+    print(f"\n== {label}: hot indexes {hot_index_size()} ==")
+    for name, sql in HOT_QUERIES.items():
+        plan = db.session.execute(text("EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) " + sql), {'group_id': group_id}).scalars().all()
+        timing = summarize(measure(lambda: db.session.execute(text(sql), {'group_id': group_id}).all(), runs))
+        print(f"\n-- {name}: median {timing['median_ms']}ms, min {timing['min_ms']}ms")
+        print('\n'.join(plan))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--groups', type=int, default=200)
+    parser.add_argument('--months', type=int, default=36)
+    parser.add_argument('--archive-after', type=int, default=12, help='months kept hot')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        seed(args.rows, args.groups, args.months)
+        report_phase('before (single table)', 1, args.runs)
+
+        for table in ('transactions', 'payments'):
+            partition_history_table(table, 3)
+        db.session.commit()
+        db.session.execute(text("ANALYZE"))
+        report_phase('partitioned by month', 1, args.runs)
+
+        archived = archive_history(args.archive_after)
+        db.session.execute(text("ANALYZE"))
+        report_phase(f'after archiving {len(archived)} month(s)', 1, args.runs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# Per-row CPU cost of the history list path, before and after selecting column tuples and
+# encoding with orjson / MessagePack. Seeds groups through the import endpoint (scratch database),
+# then times each stage with this process's CPU clock, so postgres's own work is left out:
+#   DATABASE_URL=postgresql://... python -m backend.benchmarks.bench_serialization --transactions 1000,20000
+import argparse
+import random
+import time
+
+from backend.app import create_app
+from backend.db import db
+from backend.models.transaction import Transaction
+from backend.benchmarks.common import measure, summarize, report, add_baseline_arguments
+from backend.benchmarks.bench_endpoints import seed_group
+from backend.helper.serialization import history_columns, serialize_rows, stdlib_dumps, orjson_dumps, orjson, msgpack
+
+SUITE = 'serialization'
+
+
+def orm_dicts(group_id):
+    transactions = Transaction.query.filter_by(group_id=group_id).order_by(Transaction.datetime_transaction.desc()).all()
+    dicts = [transaction.to_dict() for transaction in transactions]
+    db.session.expunge_all()  # a request starts with an empty identity map; so should the next run
+    return dicts
+
+
+def column_dicts(group_id):
+    return serialize_rows(db.session.query(*history_columns(Transaction)).filter(Transaction.group_id == group_id)
+                          .order_by(Transaction.datetime_transaction.desc()).all())
+
+
+def bench_group(group_id, transaction_count, runs):
+    label = f"t={transaction_count}"
+    rows = column_dicts(group_id)
+    stages = {
+        f"fetch orm + to_dict {label}": lambda: orm_dicts(group_id),
+        f"fetch column tuples {label}": lambda: column_dicts(group_id),
+        f"encode json {label}": lambda: stdlib_dumps(rows),
+        f"before: orm + json {label}": lambda: stdlib_dumps(orm_dicts(group_id)),
+    }
+    if orjson is not None:
+        stages[f"encode orjson {label}"] = lambda: orjson_dumps(rows)
+        stages[f"after: columns + orjson {label}"] = lambda: orjson_dumps(column_dicts(group_id))
+    if msgpack is not None:
+        stages[f"encode msgpack {label}"] = lambda: msgpack.packb(rows, default=str)
+    return {name: summarize(measure(stage, runs, clock=time.process_time)) for name, stage in stages.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--members', type=int, default=10)
+    parser.add_argument('--transactions', default='1000,20000')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+
+    results = {}
+    for transaction_count in (int(size) for size in args.transactions.split(',')):
+        group_id = seed_group(client, args.members, transaction_count, rng)
+        with app.app_context():
+            rows = Transaction.query.filter_by(group_id=group_id).count()
+            group_results = bench_group(group_id, transaction_count, args.runs)
+        for name, result in group_results.items():
+            result['us_per_row'] = round(result['min_ms'] * 1000 / rows, 2)
+        results.update(group_results)
+
+    report(results, SUITE, args)
+    print(f"\n{'benchmark':<60} {'us/row':>10}")
+    for name, result in results.items():
+        print(f"{name:<60} {result['us_per_row']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# Read throughput of the threaded Flask server against the ASGI app (asgi.py) at increasing
+# numbers of concurrent connections. Starts both servers on the configured DATABASE_URL, seeds one
+# group through the API and drives the read-only mix of loadgen against each in turn. Client
+# threads are spread over --client-processes so the load generator isn't the bottleneck.
+#   python -m backend.benchmarks.bench_serving --concurrency 16 64 256 --duration 15
+import argparse
+import multiprocessing
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from backend.benchmarks.common import save_baselines, check_regressions, BASELINES_PATH, DEFAULT_THRESHOLD
+from backend.benchmarks.loadgen import DEFAULT_MIX, worker, summarize_load, create_group
+
+SUITE = 'serving'
+READ_MIX = [(kind, weight) for kind, weight in DEFAULT_MIX if not kind.startswith('add_')]
+
+
+def server_commands(port, workers):
+    return {
+        'flask threaded': [sys.executable, '-m', 'flask', '--app', 'backend.app:create_app', 'run',
+                           '--port', str(port), '--with-threads', '--no-reload'],
+        'asgi': [sys.executable, '-m', 'uvicorn', 'backend.asgi:app', '--port', str(port),
+                 '--workers', str(workers), '--log-level', 'warning'],
+    }
+
+
+def wait_until_up(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            requests.get(f'{url}/metrics', timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+def client_process(base, members, threads, duration, first_seed, queue):
+    samples, errors, lock = defaultdict(list), defaultdict(int), threading.Lock()
+    deadline = time.monotonic() + duration
+    workers = [threading.Thread(target=worker, args=(base, members, READ_MIX, deadline, seed, samples, errors, lock))
+               for seed in range(first_seed, first_seed + threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    queue.put(([ms for timings in samples.values() for ms in timings], sum(errors.values())))
+
+
+def run_load(base, members, concurrency, duration, processes):
+    queue = multiprocessing.Queue()
+    processes = min(processes, concurrency)
+    clients = []
+    for index in range(processes):
+        threads = concurrency // processes + (1 if index < concurrency % processes else 0)
+        clients.append(multiprocessing.Process(target=client_process,
+                                               args=(base, members, threads, duration, index * concurrency, queue)))
+    for client in clients:
+        client.start()
+    timings, error_count = [], 0
+    for _ in clients:
+        part, failed = queue.get()
+        timings.extend(part)
+        error_count += failed
+    for client in clients:
+        client.join()
+    return summarize_load(timings, duration, error_count)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--members', type=int, default=8)
+    parser.add_argument('--port', type=int, default=5100)
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    parser.add_argument('--client-processes', type=int, default=4)
+    parser.add_argument('--metric', default='p99_ms', choices=('median_ms', 'p99_ms'))
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--check', action='store_true')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    results = {}
+    for offset, (server, command) in enumerate(server_commands(args.port, args.workers).items()):
+        port = args.port + offset
+        command[command.index(str(args.port))] = str(port)
+        url = f'http://127.0.0.1:{port}'
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(url, process)
+            members = [f"member{i}" for i in range(args.members)]
+            base = f'{url}/api/group/{create_group(url, members)}'
+            for concurrency in args.concurrency:
+                results[f"{server} c={concurrency}"] = run_load(base, members, concurrency, args.duration,
+                                                                args.client_processes)
+        finally:
+            process.terminate()
+            process.wait()
+
+    print(f"{'server':<28} {'p50 ms':>10} {'p99 ms':>10} {'req/s':>10} {'errors':>8}")
+    for name, result in results.items():
+        print(f"{name:<28} {result['median_ms']:>10} {result['p99_ms']:>10} {result['throughput_rps']:>10} {result['errors']:>8}")
+
+    if args.save_baseline:
+        save_baselines(results, SUITE)
+        print(f"Baseline for '{SUITE}' saved to {BASELINES_PATH}")
+    if args.check:
+        regressions = check_regressions(results, SUITE, metric=args.metric, threshold=args.threshold)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            raise SystemExit(1)
+        print("No regressions against the stored baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# Compares the settlement engine modes against the original sorted-list greedy.
+# Run from the directory containing the backend package:
+#   python -m backend.benchmarks.bench_settlement
+import argparse
+import random
+import time
+
+from backend.helper.settlement import settle_up_greedy, settle_up_min_transfers, SettlementTimeout
+
+
+def legacy_settle_up(balances):
+    # The pop(0)/insert(0, ...) implementation settle_up shipped with originally
+    creditors = sorted((user, balance) for user, balance in balances.items() if balance > 0)
+    debtors = sorted((user, -balance) for user, balance in balances.items() if balance < 0)
+
+    settlements = []
+    while creditors and debtors:
+        creditor, credit_amount = creditors.pop(0)
+        debtor, debt_amount = debtors.pop(0)
+        settlement_amount = min(credit_amount, debt_amount)
+        settlements.append({"creditor": creditor, "debtor": debtor, "amount": settlement_amount})
+        if credit_amount > settlement_amount:
+            creditors.insert(0, (creditor, credit_amount - settlement_amount))
+        if debt_amount > settlement_amount:
+            debtors.insert(0, (debtor, debt_amount - settlement_amount))
+    return settlements
+
+
+def synthetic_balances(members, rng):
+    # Round amounts and a handful of repeated values, like real shared bills produce
+    balances = {f"user{i}": rng.choice([-1, 1]) * rng.choice([50, 100, 250, 333.33, rng.randint(1, 5000)])
+                for i in range(members - 1)}
+    balances[f"user{members - 1}"] = -round(sum(balances.values()), 2)
+    return balances
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='5,10,15,18,20,100,1000,10000')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--time-budget', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    print(f"{'members':>8} {'mode':>14} {'transfers':>10} {'ms':>10}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        samples = [synthetic_balances(size, rng) for _ in range(args.runs)]
+        modes = [('legacy', legacy_settle_up), ('greedy', settle_up_greedy)]
+        if size <= 20:
+            modes.append(('min_transfers', lambda b: settle_up_min_transfers(b, args.time_budget)))
+
+        for name, fn in modes:
+            transfers, elapsed = 0, 0.0
+            try:
+                for balances in samples:
+                    result, ms = timed(fn, balances)
+                    transfers += len(result)
+                    elapsed += ms
+            except SettlementTimeout:
+                print(f"{size:>8} {name:>14} {'timeout':>10}")
+                continue
+            print(f"{size:>8} {name:>14} {transfers / args.runs:>10.1f} {elapsed / args.runs:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
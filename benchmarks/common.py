@@ -0,0 +1,87 @@
+# Shared timing, reporting and baseline helpers for the benchmark scripts
+import json
+import os
+import statistics
+import time
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+DEFAULT_THRESHOLD = 0.25  # allowed slowdown against the stored baseline
+NOISE_FLOOR_MS = 1.0  # baselines faster than this are timer noise and never flagged
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(fn, repeat=5, setup=None, clock=time.perf_counter):
+    # Runs fn `repeat` times and returns the per-run timings in milliseconds; pass
+    # clock=time.process_time to count only this process's CPU time
+    timings = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = clock()
+        fn(*args)
+        timings.append((clock() - start) * 1000)
+    return timings
+
+
+def summarize(timings):
+    return {
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'runs': len(timings)
+    }
+
+
+def load_baselines(path=BASELINES_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as baselines:
+        return json.load(baselines)
+
+
+def save_baselines(results, suite, path=BASELINES_PATH):
+    baselines = load_baselines(path)
+    baselines[suite] = results
+    with open(path, 'w') as out:
+        json.dump(baselines, out, indent=2, sort_keys=True)
+        out.write('\n')
+
+
+def check_regressions(results, suite, metric='min_ms', threshold=DEFAULT_THRESHOLD, path=BASELINES_PATH):
+    # Returns human-readable lines for every benchmark slower than baseline * (1 + threshold)
+    baseline = load_baselines(path).get(suite, {})
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name, {}).get(metric)
+        if expected and expected >= NOISE_FLOOR_MS and result[metric] > expected * (1 + threshold):
+            regressions.append(f"{name}: {metric} {result[metric]} vs baseline {expected} (+{threshold:.0%} allowed)")
+    return regressions
+
+
+def report(results, suite, args):
+    print(f"{'benchmark':<60} {'min ms':>10} {'median ms':>10} {'p99 ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<60} {result['min_ms']:>10} {result['median_ms']:>10} {result['p99_ms']:>10}")
+    if args.save_baseline:
+        save_baselines(results, suite)
+        print(f"Baseline for '{suite}' saved to {BASELINES_PATH}")
+    if args.check:
+        regressions = check_regressions(results, suite, metric=args.metric, threshold=args.threshold)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            raise SystemExit(1)
+        print("No regressions against the stored baseline")
+
+
+def add_baseline_arguments(parser):
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+    parser.add_argument('--check', action='store_true', help='Fail when slower than the stored baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    # The fastest run is the least disturbed by other load on the machine
+    parser.add_argument('--metric', default='min_ms', choices=('min_ms', 'median_ms', 'p99_ms'))
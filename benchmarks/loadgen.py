@@ -0,0 +1,141 @@
+# Concurrent load generator for a running server. Each worker loops over a weighted mix of
+# reads and writes on one group for --duration seconds; latency percentiles and throughput
+# are reported per request kind and overall.
+#   python -m backend.benchmarks.loadgen --url http://localhost:5000 --concurrency 32 --duration 30
+#   python -m backend.benchmarks.loadgen --url ... --check --metric p99_ms
+import argparse
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from backend.benchmarks.common import percentile, save_baselines, check_regressions, BASELINES_PATH, DEFAULT_THRESHOLD
+
+SUITE = 'load'
+
+# (kind, weight)
+DEFAULT_MIX = (
+    ('balances', 30), ('settlements', 10), ('transactions_page', 25), ('user_expenditure', 10),
+    ('add_transaction', 20), ('add_payment', 5)
+)
+
+
+def send(session, base, kind, members, rng):
+    if kind == 'balances':
+        return session.get(f'{base}/balances')
+    if kind == 'settlements':
+        return session.get(f'{base}/settlements')
+    if kind == 'transactions_page':
+        return session.get(f'{base}/transactions', params={'limit': 50})
+    if kind == 'user_expenditure':
+        return session.get(f'{base}/user_expenditure')
+    payer, other = rng.sample(members, 2)
+    amount = rng.randint(1, 500) * 2
+    if kind == 'add_transaction':
+        return session.post(f'{base}/transaction', json={
+            'description': 'Load', 'amount': amount, 'paid_by': [{'username': payer, 'amount': amount}],
+            'split': {'mode': 'equal', 'amount': amount, 'members': [payer, other]}
+        })
+    return session.post(f'{base}/payment', json={'amount': amount, 'paid_from': payer, 'paid_to': other})
+
+
+def worker(base, members, mix, deadline, seed, samples, errors, lock):
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix)
+    session = requests.Session()
+    local, failed = defaultdict(list), defaultdict(int)
+    while time.monotonic() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        start = time.perf_counter()
+        try:
+            response = send(session, base, kind, members, rng)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = (time.perf_counter() - start) * 1000
+        if ok:
+            local[kind].append(elapsed)
+        else:
+            failed[kind] += 1
+    with lock:
+        for kind, timings in local.items():
+            samples[kind].extend(timings)
+        for kind, count in failed.items():
+            errors[kind] += count
+
+
+def summarize_load(timings, duration, error_count):
+    return {
+        'median_ms': round(statistics.median(timings), 3) if timings else 0.0,
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'throughput_rps': round(len(timings) / duration, 1),
+        'errors': error_count,
+        'runs': len(timings)
+    }
+
+
+def create_group(url, members):
+    response = requests.post(f'{url}/api/group', json={
+        'name': 'load test', 'usernames': [{'username': member} for member in members]})
+    response.raise_for_status()
+    return response.json()['group']['id']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--group-id', type=int, help='Existing group to load; a fresh one is created otherwise')
+    parser.add_argument('--members', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--read-only', action='store_true')
+    parser.add_argument('--metric', default='p99_ms', choices=('median_ms', 'p99_ms'))
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--check', action='store_true')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/')
+    if args.group_id:
+        group_id = args.group_id
+        members = [user['username'] for user in requests.get(f'{url}/api/group/{group_id}/usernames').json()['usernames']]
+    else:
+        members = [f"member{i}" for i in range(args.members)]
+        group_id = create_group(url, members)
+    mix = [(kind, weight) for kind, weight in DEFAULT_MIX if not (args.read_only and kind.startswith('add_'))]
+
+    samples, errors, lock = defaultdict(list), defaultdict(int), threading.Lock()
+    deadline = time.monotonic() + args.duration
+    threads = [threading.Thread(target=worker, args=(f'{url}/api/group/{group_id}', members, mix, deadline, seed,
+                                                     samples, errors, lock))
+               for seed in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results = {f"{kind} c={args.concurrency}": summarize_load(samples[kind], args.duration, errors[kind])
+               for kind, _ in mix}
+    results[f"overall c={args.concurrency}"] = summarize_load(
+        [ms for timings in samples.values() for ms in timings], args.duration, sum(errors.values()))
+
+    print(f"{'request':<32} {'p50 ms':>10} {'p99 ms':>10} {'req/s':>10} {'errors':>8}")
+    for name, result in results.items():
+        print(f"{name:<32} {result['median_ms']:>10} {result['p99_ms']:>10} {result['throughput_rps']:>10} {result['errors']:>8}")
+
+    if args.save_baseline:
+        save_baselines(results, SUITE)
+        print(f"Baseline for '{SUITE}' saved to {BASELINES_PATH}")
+    if args.check:
+        regressions = check_regressions(results, SUITE, metric=args.metric, threshold=args.threshold)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            raise SystemExit(1)
+        print("No regressions against the stored baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+# Concurrency stress check for the balance update path: N writer threads post transactions
+# and payments to the same group, then the final balances must match the exact expected sums.
+# A second round races updates and deletes of the same transaction and payment, after which
+# the balances must equal the ones recomputed from the rows left in the database.
+# Needs a scratch postgres database; tables are created if missing:
+#   DATABASE_URL=postgresql://... python -m backend.benchmarks.stress_balances --writers 16
+import argparse
+import random
+import threading
+from collections import defaultdict
+
+from backend.app import create_app
+from backend.db import db
+from backend.models.transaction import Transaction
+from backend.models.payment import Payment
+from backend.helper.balances import transaction_balance_deltas, payment_balance_deltas
+
+
+def writer(app, group_id, members, operations, seed, expected, lock, failures):
+    rng = random.Random(seed)
+    client = app.test_client()
+    local = defaultdict(int)  # cents
+    for _ in range(operations):
+        payer, other = rng.sample(members, 2)
+        # Whole, even amounts keep the add_transaction paid/shared equality check exact
+        cents = rng.randint(1, 500) * 200
+        if rng.random() < 0.7:
+            share = cents // 2
+            response = client.post(f'/api/group/{group_id}/transaction', json={
+                'amount': cents / 100,
+                'paid_by': [{'username': payer, 'amount': cents / 100}],
+                'paid_for': [payer, other],
+                'share_details': [{'username': payer, 'amount': (cents - share) / 100},
+                                  {'username': other, 'amount': share / 100}],
+            })
+            local[payer] += cents - (cents - share)
+            local[other] -= share
+        else:
+            response = client.post(f'/api/group/{group_id}/payment', json={
+                'amount': cents / 100, 'paid_from': payer, 'paid_to': other})
+            local[payer] += cents
+            local[other] -= cents
+        if response.status_code != 200:
+            failures.append(response.get_json())
+            return
+    with lock:
+        for member, cents in local.items():
+            expected[member] += cents
+
+
+def editor(app, group_id, members, transaction_id, payment_id, seed, barrier, failures):
+    rng = random.Random(seed)
+    client = app.test_client()
+    payer, other = rng.sample(members, 2)
+    cents = rng.randint(1, 500) * 200
+    barrier.wait()
+    choice = rng.random()
+    if choice < 0.35:
+        response = client.put(f'/api/group/{group_id}/transaction/{transaction_id}', json={
+            'amount': cents / 100,
+            'paid_by': [{'username': payer, 'amount': cents / 100}],
+            'paid_for': [payer, other],
+            'share_details': [{'username': payer, 'amount': cents / 200}, {'username': other, 'amount': cents / 200}],
+        })
+    elif choice < 0.7:
+        response = client.put(f'/api/group/{group_id}/payment/{payment_id}', json={
+            'amount': cents / 100, 'paid_from': payer, 'paid_to': other})
+    elif choice < 0.85:
+        response = client.delete(f'/api/group/{group_id}/transaction/{transaction_id}')
+    else:
+        response = client.delete(f'/api/group/{group_id}/payment/{payment_id}')
+    # A row deleted by another editor is gone by the time this one gets the lock
+    if response.status_code not in (200, 404):
+        failures.append(response.get_json())
+
+
+def recomputed_balances(app, group_id):
+    # Balances straight from the stored rows, in cents
+    balances = defaultdict(int)
+    with app.app_context():
+        for transaction in Transaction.query.filter_by(group_id=group_id):
+            for member, delta in transaction_balance_deltas(transaction, 'add').items():
+                balances[member] += round(delta * 100)
+        for payment in Payment.query.filter_by(group_id=group_id):
+            for member, delta in payment_balance_deltas(payment, 'add').items():
+                balances[member] += round(delta * 100)
+    return balances
+
+
+def edit_race(app, client, group_id, members, editors):
+    transaction = client.post(f'/api/group/{group_id}/transaction', json={
+        'amount': 10, 'paid_by': [{'username': members[0], 'amount': 10}], 'paid_for': members[:2],
+        'share_details': [{'username': members[0], 'amount': 5}, {'username': members[1], 'amount': 5}],
+    }).get_json()['transaction']['id']
+    payment = client.post(f'/api/group/{group_id}/payment', json={
+        'amount': 10, 'paid_from': members[0], 'paid_to': members[1]}).get_json()['payment']['id']
+
+    barrier, failures = threading.Barrier(editors), []
+    threads = [threading.Thread(target=editor, args=(app, group_id, members, transaction, payment, seed, barrier, failures))
+               for seed in range(editors)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise SystemExit(f"Edits failed: {failures[:3]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--operations', type=int, default=50, help='writes per writer')
+    parser.add_argument('--members', type=int, default=6)
+    parser.add_argument('--editors', type=int, default=16, help='threads racing to edit one row')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    members = [f"member{i}" for i in range(args.members)]
+    group = client.post('/api/group', json={'name': 'stress', 'usernames': [{'username': m} for m in members]})
+    group_id = group.get_json()['group']['id']
+
+    expected, lock, failures = defaultdict(int), threading.Lock(), []
+    threads = [threading.Thread(target=writer, args=(app, group_id, members, args.operations, seed, expected, lock, failures))
+               for seed in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise SystemExit(f"Writes failed: {failures[:3]}")
+
+    balances = client.get(f'/api/group/{group_id}/balances').get_json()['balances']
+    mismatches = {m: (round(balances[m] * 100), expected[m]) for m in members if round(balances[m] * 100) != expected[m]}
+    print(f"{args.writers} writers x {args.operations} writes on group {group_id}")
+    if mismatches:
+        raise SystemExit(f"Lost updates detected (actual, expected cents): {mismatches}")
+    print("Final balances exact:", balances)
+
+    edit_race(app, client, group_id, members, args.editors)
+    balances = client.get(f'/api/group/{group_id}/balances').get_json()['balances']
+    expected = recomputed_balances(app, group_id)
+    mismatches = {m: (round(balances[m] * 100), expected[m]) for m in members if round(balances[m] * 100) != expected[m]}
+    print(f"{args.editors} editors raced on one transaction and one payment")
+    if mismatches:
+        raise SystemExit(f"Balances drifted from the stored rows (actual, expected cents): {mismatches}")
+    print("Balances match the stored rows:", balances)
+
+
+if __name__ == '__main__':
+    main()
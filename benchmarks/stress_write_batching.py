@@ -0,0 +1,101 @@
+# Stress check for group commit (WRITE_BATCHING_ENABLED): writer threads post transactions and
+# payments to one group, with every --invalid-every'th write rejected by validation. The valid
+# writes must all land in the balances and all be published as group_changed events, however
+# their batches were mixed with rejected ones.
+#   DATABASE_URL=postgresql://... python -m backend.benchmarks.stress_write_batching --writers 16
+import argparse
+import threading
+import time
+from collections import defaultdict
+
+from backend.app import create_app
+from backend.db import db
+from backend.websocket import coalescer
+from backend.helper.write_batching import write_batcher
+
+
+def writer(app, group_id, members, operations, seed, invalid_every, results, lock):
+    client = app.test_client()
+    for index in range(operations):
+        payer, other = members[(seed + index) % len(members)], members[(seed + index + 1) % len(members)]
+        invalid = invalid_every and (seed * operations + index) % invalid_every == 0
+        if index % 2:
+            response = client.post(f'/api/group/{group_id}/payment', json={
+                'amount': 2, 'paid_from': 'nobody' if invalid else payer, 'paid_to': other})
+            kind = 'payment'
+        else:
+            response = client.post(f'/api/group/{group_id}/transaction', json={
+                'amount': 4,
+                'paid_by': [{'username': payer, 'amount': 4}],
+                'paid_for': [payer, other],
+                'share_details': [{'username': payer, 'amount': 2}, {'username': other, 'amount': 3 if invalid else 2}],
+            })
+            kind = 'transaction'
+        with lock:
+            results.append((kind, payer, other, invalid, response.status_code, response.get_json()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--operations', type=int, default=20, help='writes per writer')
+    parser.add_argument('--members', type=int, default=4)
+    parser.add_argument('--invalid-every', type=int, default=7)
+    parser.add_argument('--window', type=float, default=0.02, help='WRITE_BATCH_WINDOW in seconds')
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config.update(WRITE_BATCHING_ENABLED=True, WRITE_BATCH_WINDOW=args.window)
+    write_batcher.init_app(app)
+    with app.app_context():
+        db.create_all()
+
+    published, publish_lock = [], threading.Lock()
+
+    def record(event, payload, to=None):
+        with publish_lock:
+            published.append(payload)
+    coalescer.emitter = record
+
+    client = app.test_client()
+    members = [f"member{i}" for i in range(args.members)]
+    group = client.post('/api/group', json={'name': 'batching', 'usernames': [{'username': m} for m in members]})
+    group_id = group.get_json()['group']['id']
+
+    results, lock = [], threading.Lock()
+    threads = [threading.Thread(target=writer, args=(app, group_id, members, args.operations, seed,
+                                                     args.invalid_every, results, lock))
+               for seed in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(coalescer.window * 2)
+    coalescer.flush(group_id)
+
+    expected, applied = defaultdict(int), set()
+    for kind, payer, other, invalid, status, body in results:
+        if status != (400 if invalid else 200):
+            raise SystemExit(f"Unexpected {status} for a{' rejected' if invalid else ''} {kind}: {body}")
+        if invalid:
+            continue
+        applied.add((kind, body[kind]['id']))
+        expected[payer] += 2
+        expected[other] -= 2
+
+    balances = client.get(f'/api/group/{group_id}/balances').get_json()['balances']
+    mismatches = {m: (balances[m], expected[m]) for m in members if balances[m] != expected[m]}
+    if mismatches:
+        raise SystemExit(f"Balances wrong (actual, expected): {mismatches}")
+
+    announced = {(change['entity_type'], change['id']) for payload in published
+                 if payload['group_id'] == group_id for change in payload['changes']}
+    missing = applied - announced
+    if missing:
+        raise SystemExit(f"{len(missing)} applied writes were never published, e.g. {sorted(missing)[:3]}")
+    rejected = sum(1 for result in results if result[3])
+    print(f"{len(applied)} writes applied and published, {rejected} rejected; balances exact: {balances}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,3 @@
+from backend.helper.cache import ReadThroughCache
+
+cache = ReadThroughCache()
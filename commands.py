@@ -0,0 +1,147 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import text
+from backend.db import db
+from backend.helper.totals import rebuild_member_totals
+from backend.helper.entries import backfill_transaction_entries
+from backend.helper.rollups import rebuild_spending_rollup
+from backend.helper.memberships import backfill_group_memberships
+from backend.helper.ledger import audit_group_balances, rebuild_group_balances, checkpoint_group
+from backend.helper.filters import SEARCH_VECTOR_DDL
+from backend.helper.partitions import (
+    PARTITIONED_TABLES, partition_history_table, create_upcoming_partitions, archive_history
+)
+
+
+@click.command('rebuild-member-totals')
+@click.option('--group-id', type=int, default=None, help='Only rebuild this group')
+@with_appcontext
+def rebuild_member_totals_command(group_id):
+    rebuild_member_totals(group_id)
+    db.session.commit()
+    click.echo("Member totals rebuilt")
+
+
+@click.command('rebuild-spending-rollup')
+@click.option('--group-id', type=int, default=None, help='Only rebuild this group')
+@with_appcontext
+def rebuild_spending_rollup_command(group_id):
+    # Backfills daily_spending from live and archived transactions
+    rebuild_spending_rollup(group_id)
+    db.session.commit()
+    click.echo("Spending rollup rebuilt")
+
+
+@click.command('backfill-transaction-entries')
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+@with_appcontext
+def backfill_transaction_entries_command(batch_size):
+    batches = backfill_transaction_entries(batch_size)
+    click.echo(f"Transaction entries backfilled in {batches} batch(es)")
+
+
+@click.command('backfill-group-memberships')
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+@with_appcontext
+def backfill_group_memberships_command(batch_size):
+    batches = backfill_group_memberships(batch_size)
+    click.echo(f"Group memberships backfilled in {batches} batch(es)")
+
+
+@click.command('audit-balances')
+@click.option('--group-id', type=int, multiple=True, help='Only audit these groups (repeatable)')
+@click.option('--rebuild', is_flag=True, help='Overwrite drifted balances with the replayed ledger')
+@click.option('--seed', is_flag=True, help='Checkpoint groups that have no ledger baseline yet')
+@with_appcontext
+def audit_balances_command(group_id, rebuild, seed):
+    # Replaying every group's ledger can run far past DB_STATEMENT_TIMEOUT_MS
+    db.session.execute(text("SET LOCAL statement_timeout = 0"))
+    verified, drifted, missing_baseline = audit_group_balances(list(group_id) or None)
+    click.echo(f"{len(verified)} group(s) verified, {len(drifted)} drifted, {len(missing_baseline)} without a baseline")
+    for drifted_id in drifted:
+        click.echo(f"Group {drifted_id}: balances drifted from the ledger")
+        if rebuild:
+            rebuild_group_balances(drifted_id)
+            db.session.commit()
+            click.echo(f"Group {drifted_id}: balances rebuilt")
+    if seed:
+        for missing_id in missing_baseline:
+            checkpoint_group(missing_id)
+            db.session.commit()
+        click.echo(f"{len(missing_baseline)} group(s) checkpointed")
+    if drifted and not rebuild:
+        raise SystemExit(1)
+
+
+@click.command('add-transaction-filter-indexes')
+@with_appcontext
+def add_transaction_filter_indexes_command():
+    # For databases created before the history filters; create_all covers new ones.
+    # CONCURRENTLY keeps the table writable while the indexes build, but can't run in a transaction.
+    statements = [
+        SEARCH_VECTOR_DDL,
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_paid_by ON transactions USING gin (paid_by jsonb_path_ops)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_share_details ON transactions USING gin (share_details jsonb_path_ops)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_search_vector ON transactions USING gin (search_vector)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_group_id_amount ON transactions (group_id, amount)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_group_id_mode ON transactions (group_id, mode)",
+    ]
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        # Outside a transaction SET LOCAL has no effect, so lift the timeout for the session and
+        # put it back before the connection returns to the pool
+        connection.execute(text("SET statement_timeout = 0"))
+        try:
+            for statement in statements:
+                connection.execute(text(statement))
+        finally:
+            connection.execute(text("RESET statement_timeout"))
+    click.echo("Transaction filter column and indexes in place")
+
+
+@click.command('partition-history-tables')
+@click.option('--months-ahead', type=int, default=None, help='Empty partitions to create past the current month')
+@with_appcontext
+def partition_history_tables_command(months_ahead):
+    # One-off migration; takes an exclusive lock on each table while its rows are copied
+    months_ahead = current_app.config['HISTORY_PARTITIONS_AHEAD'] if months_ahead is None else months_ahead
+    for table in PARTITIONED_TABLES:
+        copied = partition_history_table(table, months_ahead)
+        db.session.commit()
+        click.echo(f"{table}: already partitioned" if copied is None else f"{table}: partitioned, {copied} row(s) copied")
+
+
+@click.command('create-history-partitions')
+@click.option('--months-ahead', type=int, default=None)
+@with_appcontext
+def create_history_partitions_command(months_ahead):
+    # Run monthly (e.g. from cron) so new rows never land in the default partition
+    months_ahead = current_app.config['HISTORY_PARTITIONS_AHEAD'] if months_ahead is None else months_ahead
+    for table, count in create_upcoming_partitions(months_ahead).items():
+        click.echo(f"{table}: {count} partition(s) ensured")
+    db.session.commit()
+
+
+@click.command('archive-history')
+@click.option('--older-than-months', type=int, default=None)
+@with_appcontext
+def archive_history_command(older_than_months):
+    config = current_app.config
+    horizon = config['HISTORY_ARCHIVE_AFTER_MONTHS'] if older_than_months is None else older_than_months
+    archived = archive_history(horizon, config['HISTORY_ARCHIVE_COMPRESSION'])
+    for name, groups in archived:
+        if groups:
+            click.echo(f"{name}: archived for {groups} group(s)")
+    click.echo(f"{len(archived)} partition(s) archived")
+
+
+def register_commands(app):
+    app.cli.add_command(rebuild_member_totals_command)
+    app.cli.add_command(backfill_transaction_entries_command)
+    app.cli.add_command(rebuild_spending_rollup_command)
+    app.cli.add_command(backfill_group_memberships_command)
+    app.cli.add_command(audit_balances_command)
+    app.cli.add_command(add_transaction_filter_indexes_command)
+    app.cli.add_command(partition_history_tables_command)
+    app.cli.add_command(create_history_partitions_command)
+    app.cli.add_command(archive_history_command)
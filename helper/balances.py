@@ -0,0 +1,69 @@
+import json
+from sqlalchemy import text
+from sqlalchemy.orm.attributes import set_committed_value
+from backend.db import db
+from backend.helper.helper import update_balances_transaction
+from backend.helper.group_cache import mark_group_changed
+
+
+def transaction_balance_deltas(transaction, operation, old_share_details=None, old_paid_by=None):
+    # Running the regular balance update against an empty dict yields just the per-member change
+    return update_balances_transaction({}, transaction, operation, old_share_details, old_paid_by)
+
+
+def payment_balance_deltas(payment, operation, old_paid_from=None, old_paid_to=None, old_payment_amount=None):
+    deltas = {}
+    if operation == 'update':
+        deltas[old_paid_from] = deltas.get(old_paid_from, 0) - old_payment_amount
+        deltas[old_paid_to] = deltas.get(old_paid_to, 0) + old_payment_amount
+
+    amount = payment.amount if operation != 'delete' else -payment.amount
+    deltas[payment.paid_from] = deltas.get(payment.paid_from, 0) + amount
+    deltas[payment.paid_to] = deltas.get(payment.paid_to, 0) - amount
+    return deltas
+
+
+# Postgres re-reads the locked row before evaluating SET, so concurrent increments to the
+# same group serialize on the row lock instead of overwriting each other's JSONB document.
+# Every balance change is also a new group version, except for a write batch's single update,
+# whose version was taken when the batch locked the group. Members in :zeroed are set to
+# exactly 0 afterwards, dropping any sub-cent residue the deltas leave behind.
+APPLY_BALANCE_DELTAS_SQL = text("""
+UPDATE groups
+SET balances = COALESCE(balances, '{}'::jsonb) || COALESCE((
+    SELECT jsonb_object_agg(d.key, COALESCE((groups.balances ->> d.key)::numeric, 0) + d.value::numeric)
+    FROM jsonb_each_text(CAST(:deltas AS jsonb)) AS d
+), '{}'::jsonb) || COALESCE((
+    SELECT jsonb_object_agg(z.username, 0) FROM jsonb_array_elements_text(CAST(:zeroed AS jsonb)) AS z(username)
+), '{}'::jsonb),
+    version = version + :version_step
+WHERE id = :group_id
+RETURNING balances, version
+""")
+
+
+def apply_balance_deltas(group, deltas):
+    deltas = {username: delta for username, delta in deltas.items() if delta}
+    batched = db.session.info.get('batched_balance_deltas', {}).get(group.id)
+    if batched is not None:
+        # Inside a write batch: fold into the batch's one UPDATE, keeping the loaded balances
+        # current so ledger checkpoints taken mid-batch still see every earlier write
+        balances = dict(group.balances or {})
+        for username, delta in deltas.items():
+            batched[username] = batched.get(username, 0) + delta
+            balances[username] = balances.get(username, 0) + delta
+        set_committed_value(group, 'balances', balances)
+        return balances
+
+    return write_balance_deltas(group, deltas, version_step=1)
+
+
+def write_balance_deltas(group, deltas, version_step, zeroed=()):
+    balances, version = db.session.execute(APPLY_BALANCE_DELTAS_SQL, {
+        'group_id': group.id, 'deltas': json.dumps(deltas), 'zeroed': json.dumps(list(zeroed)),
+        'version_step': version_step}).one()
+    # Refresh the loaded group without marking it dirty, so the ORM never writes the blob back
+    set_committed_value(group, 'balances', balances)
+    set_committed_value(group, 'version', version)
+    mark_group_changed(group.id, version)
+    return balances
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ReadThroughCache:
+    # Bounded LRU with a per-entry TTL. Keys are tuples whose second element is the group id,
+    # e.g. ('settlements', group_id, version, mode), so a group's entries can be dropped together.
+
+    def __init__(self, max_entries=10000, ttl=5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = True
+        self._entries = OrderedDict()
+        self._group_keys = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.max_entries = app.config['CACHE_MAX_ENTRIES']
+        self.ttl = app.config['CACHE_TTL']
+        self.enabled = app.config['CACHE_ENABLED']
+        self.clear()
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        keys = self._group_keys.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._group_keys[key[1]]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            # A write committed while the value was being loaded; storing it could resurrect stale data
+            if generation is not None and self._generations.get(key[1], 0) != generation:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            self._group_keys.setdefault(key[1], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader, keep=None):
+        # keep(value) can veto storing a freshly loaded value, e.g. one read from a lagging replica
+        if not self.enabled:
+            return loader()
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            generation = self._generations.get(key[1], 0)
+        value = loader()
+        if value is not None and (keep is None or keep(value)):
+            self.set(key, value, generation)
+        return value
+
+    def invalidate_group(self, group_id):
+        with self._lock:
+            self._generations[group_id] = self._generations.get(group_id, 0) + 1
+            for key in list(self._group_keys.get(group_id, ())):
+                self._drop(key)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._group_keys.clear()
+            self._generations.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,67 @@
+from sqlalchemy import text
+from backend.db import db
+from backend.models.transaction_entry import TransactionEntry
+
+PAYER = 'payer'
+SHARE = 'share'
+
+
+def transaction_entry_rows(transaction):
+    rows = [{'transaction_id': transaction.id, 'group_id': transaction.group_id, 'member': payer['username'],
+             'role': PAYER, 'amount': payer['amount']} for payer in transaction.paid_by or []]
+    rows += [{'transaction_id': transaction.id, 'group_id': transaction.group_id, 'member': share['username'],
+              'role': SHARE, 'amount': share['amount']} for share in transaction.share_details or []]
+    return rows
+
+
+def write_transaction_entries(transaction, replace=False):
+    # New transactions need their id before the entries can reference it
+    if transaction.id is None:
+        db.session.flush()
+    if replace:
+        delete_transaction_entries(transaction)
+    rows = transaction_entry_rows(transaction)
+    if rows:
+        db.session.execute(TransactionEntry.__table__.insert(), rows)
+
+
+def delete_transaction_entries(transaction):
+    TransactionEntry.query.filter_by(transaction_id=transaction.id).delete(synchronize_session=False)
+
+
+def rename_transaction_entries(group_id, old_username, new_username):
+    TransactionEntry.query.filter_by(group_id=group_id, member=old_username).update(
+        {'member': new_username}, synchronize_session=False)
+
+
+BACKFILL_ENTRIES_SQL = """
+INSERT INTO transaction_entries (transaction_id, group_id, member, role, amount)
+SELECT t.id, t.group_id, e.value ->> 'username', e.role, (e.value ->> 'amount')::float
+FROM transactions t
+CROSS JOIN LATERAL (
+    SELECT value, 'payer' AS role FROM jsonb_array_elements(COALESCE(t.paid_by, '[]'::jsonb))
+    UNION ALL
+    SELECT value, 'share' AS role FROM jsonb_array_elements(COALESCE(t.share_details, '[]'::jsonb))
+) e
+WHERE t.id > :after_id AND t.id <= :until_id
+  AND NOT EXISTS (SELECT 1 FROM transaction_entries te WHERE te.transaction_id = t.id)
+"""
+
+
+def backfill_transaction_entries(batch_size=1000):
+    # Walks transactions by id in batches and commits after each one, so the backfill can run
+    # against a live database and be resumed; already-populated transactions are skipped.
+    after_id = 0
+    batches = 0
+    while True:
+        until_id = db.session.execute(
+            text("SELECT MAX(id) FROM (SELECT id FROM transactions WHERE id > :after_id ORDER BY id LIMIT :batch_size) b"),
+            {'after_id': after_id, 'batch_size': batch_size}).scalar()
+        if until_id is None:
+            return batches
+        # Each batch is its own transaction, so the timeout is lifted again for every one
+        db.session.execute(text("SET LOCAL statement_timeout = 0"))
+        db.session.execute(text(BACKFILL_ENTRIES_SQL), {'after_id': after_id, 'until_id': until_id})
+        db.session.commit()
+        after_id = until_id
+        batches += 1
@@ -0,0 +1,81 @@
+from datetime import datetime
+from sqlalchemy import func, literal
+from sqlalchemy.dialects.postgresql import JSONB
+from backend.models.transaction import Transaction
+from backend.models.payment import Payment
+
+SEARCH_CONFIG = 'english'  # must match the search_vector expression on Transaction
+# Adds Transaction.search_vector to tables created before it existed
+SEARCH_VECTOR_DDL = ("ALTER TABLE transactions ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                     "GENERATED ALWAYS AS (to_tsvector('english', coalesce(description, ''))) STORED")
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+def _datetime_arg(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidFilter(f"{name} must be an ISO 8601 date or datetime")
+
+
+def _amount_arg(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise InvalidFilter(f"{name} must be a number")
+
+
+def _range_filters(query, args, datetime_column, amount_column):
+    since, until = _datetime_arg(args, 'from'), _datetime_arg(args, 'to')
+    if since:
+        query = query.filter(datetime_column >= since)
+    if until:
+        query = query.filter(datetime_column < until)
+
+    min_amount, max_amount = _amount_arg(args, 'min_amount'), _amount_arg(args, 'max_amount')
+    if min_amount is not None:
+        query = query.filter(amount_column >= min_amount)
+    if max_amount is not None:
+        query = query.filter(amount_column <= max_amount)
+    return query
+
+
+def filter_transactions(query, args):
+    # Every filter maps onto an index: (group_id, datetime) for from/to, (group_id, amount),
+    # (group_id, mode), the jsonb_path_ops GIN indexes for payer/participant and the
+    # search_vector GIN index for q. Postgres combines them with bitmap ANDs.
+    query = _range_filters(query, args, Transaction.datetime_transaction, Transaction.amount)
+
+    if args.get('mode'):
+        query = query.filter(Transaction.mode == args['mode'])
+    # Containment (@>) is the operator jsonb_path_ops indexes support
+    if args.get('payer'):
+        query = query.filter(Transaction.paid_by.contains([{'username': args['payer']}]))
+    if args.get('participant'):
+        query = query.filter(Transaction.share_details.contains([{'username': args['participant']}]))
+    if args.get('q'):
+        query = query.filter(Transaction.search_vector.op('@@')(func.websearch_to_tsquery(SEARCH_CONFIG, args['q'])))
+    return query
+
+
+def filter_payments(query, args):
+    query = _range_filters(query, args, Payment.datetime_payment, Payment.amount)
+
+    # paid_from/paid_to hold JSON strings, so usernames are compared as jsonb values
+    if args.get('paid_from'):
+        query = query.filter(Payment.paid_from == literal(args['paid_from'], JSONB))
+    if args.get('paid_to'):
+        query = query.filter(Payment.paid_to == literal(args['paid_to'], JSONB))
+    if args.get('member'):
+        member = literal(args['member'], JSONB)
+        query = query.filter((Payment.paid_from == member) | (Payment.paid_to == member))
+    return query
@@ -0,0 +1,73 @@
+import threading
+from flask import has_request_context
+from sqlalchemy import event
+from backend.cache import cache
+from backend.db import db
+from backend.models.group import Group
+from backend.helper.replicas import pinned_to_primary
+
+# Newest version of each group this process has committed or read from the primary; a replica
+# that is behind it must not put its older copy of the group into the cache
+_known_versions = {}
+_known_versions_lock = threading.Lock()
+
+
+def note_group_version(group_id, version):
+    with _known_versions_lock:
+        if version and version > _known_versions.get(group_id, 0):
+            _known_versions[group_id] = version
+
+
+def is_current(snapshot):
+    with _known_versions_lock:
+        return snapshot['version'] >= _known_versions.get(snapshot['id'], 0)
+
+
+def load_group_snapshot(group_id):
+    group = Group.query.get(group_id)
+    return group.to_dict() if group else None
+
+
+def group_snapshot(group_id):
+    # Plain dict copy of the group row; shared between threads, so callers must not mutate it
+    if has_request_context() and pinned_to_primary():
+        # The client just wrote: read the primary directly rather than a cache a replica may have filled
+        snapshot = load_group_snapshot(group_id)
+        if snapshot:
+            note_group_version(group_id, snapshot['version'])
+        return snapshot
+    return cache.get_or_load(('group', group_id), lambda: load_group_snapshot(group_id), keep=is_current)
+
+
+def cached_for_version(kind, snapshot, loader, *variant):
+    # Derived values never change within a version, so the version is part of the key
+    return cache.get_or_load((kind, snapshot['id'], snapshot['version'], *variant), loader)
+
+
+def mark_group_changed(group_id, version=None):
+    changed = db.session.info.setdefault('changed_groups', {})
+    changed[group_id] = max(changed.get(group_id) or 0, version or 0)
+
+
+def invalidate_changed_groups(session):
+    # Savepoint commits fire after_commit too; only the outer commit makes the write visible
+    if session.in_nested_transaction():
+        return
+    for group_id, version in session.info.pop('changed_groups', {}).items():
+        note_group_version(group_id, version)
+        cache.invalidate_group(group_id)
+
+
+def discard_changed_groups(session, previous_transaction=None):
+    # A rolled back savepoint leaves the rest of the transaction's changes in place
+    if previous_transaction is not None and previous_transaction.nested:
+        return
+    session.info.pop('changed_groups', None)
+
+
+def init_group_cache(app):
+    cache.init_app(app)
+    # Drop a group's entries only once its write is durable; rolled back writes change nothing
+    if not event.contains(db.session, 'after_commit', invalidate_changed_groups):
+        event.listen(db.session, 'after_commit', invalidate_changed_groups)
+        event.listen(db.session, 'after_soft_rollback', discard_changed_groups)
@@ -1,4 +1,5 @@
 from datetime import datetime
+from backend.helper.settlement import settle_up
 
 def update_balances_transaction(balances, transaction, operation, old_share_details=None, old_paid_by=None):
     paid_by = transaction.paid_by
@@ -46,30 +47,6 @@ def update_balances_payment(balances, payment, operation, old_paid_from=None, ol
     return balances
 
 
-def settle_up(balances):
-    creditors = sorted((user, balance) for user, balance in balances.items() if balance > 0)
-    debtors = sorted((user, -balance) for user, balance in balances.items() if balance < 0)
-
-    settlements = []
-    while creditors and debtors:
-        creditor, credit_amount = creditors.pop(0)
-        debtor, debt_amount = debtors.pop(0)
-
-        settlement_amount = min(credit_amount, debt_amount)
-
-        settlements.append({
-            "creditor": creditor,
-            "debtor": debtor,
-            "amount": settlement_amount
-        })
-
-        if credit_amount > settlement_amount:
-            creditors.insert(0, (creditor, credit_amount - settlement_amount))
-        if debt_amount > settlement_amount:
-            debtors.insert(0, (debtor, debt_amount - settlement_amount))
-
-    return settlements
-
 def calculate_user_expenditures(transactions):
     user_expenditures = {}
 
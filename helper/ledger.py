@@ -0,0 +1,135 @@
+from flask import current_app
+from sqlalchemy import func, select, text
+from backend.db import db
+from backend.models.group import Group
+from backend.models.ledger_event import LedgerEvent
+from backend.models.balance_checkpoint import BalanceCheckpoint
+
+# Balances are compared to the cent when auditing
+BALANCE_TOLERANCE = 0.005
+
+
+def record_event(group, entity_type, operation, entity=None, deltas=None, payload=None):
+    # The caller must hold the group row lock (taken by the balance UPDATE or a FOR UPDATE read)
+    # whenever the event changes balances, so event ids follow commit order within a group.
+    if group.id is None or (entity is not None and entity.id is None):
+        db.session.flush()
+
+    event = LedgerEvent(group_id=group.id, entity_type=entity_type, operation=operation,
+                        entity_id=entity.id if entity is not None else None,
+                        deltas={username: delta for username, delta in (deltas or {}).items() if delta},
+                        payload=payload)
+    db.session.add(event)
+    db.session.flush()
+
+    # Counted on the group row the caller already holds, instead of counting the ledger
+    pending = db.session.execute(COUNT_EVENT_SQL, {'group_id': group.id}).scalar()
+    if (event.deltas or entity_type in ('group', 'member')) and pending >= current_app.config['LEDGER_CHECKPOINT_INTERVAL']:
+        write_checkpoint(group, event.id)
+    return event
+
+
+COUNT_EVENT_SQL = text(
+    "UPDATE groups SET events_since_checkpoint = events_since_checkpoint + 1 WHERE id = :group_id "
+    "RETURNING events_since_checkpoint")
+
+
+def write_checkpoint(group, event_id):
+    checkpoint = BalanceCheckpoint(group_id=group.id, event_id=event_id, balances=dict(group.balances or {}))
+    db.session.add(checkpoint)
+    db.session.execute(text("UPDATE groups SET events_since_checkpoint = 0 WHERE id = :group_id"), {'group_id': group.id})
+    return checkpoint
+
+
+def apply_event(balances, entity_type, operation, deltas, payload):
+    if entity_type == 'group' and operation == 'add':
+        for username in payload['usernames']:
+            balances[username] = 0
+    elif entity_type == 'member' and operation == 'add':
+        balances[payload['username']] = 0
+    elif entity_type == 'member' and operation == 'rename':
+        balances[payload['new']] = balances.pop(payload['old'], 0)
+    elif entity_type == 'member' and operation == 'remove':
+        balances.pop(payload['username'], None)
+
+    for username, delta in (deltas or {}).items():
+        balances[username] = balances.get(username, 0) + delta
+    if entity_type == 'settlement':
+        # Settling also clears the sub-cent residue the payments leave behind
+        for username in (payload or {}).get('zeroed', ()):
+            balances[username] = 0
+    return balances
+
+
+def replay_balances(group_ids=None):
+    # Returns {group_id: (balances, last_event_id, has_baseline)} by folding only the events
+    # recorded after each group's latest checkpoint. A group has a baseline when it has a
+    # checkpoint or its event stream starts with its own creation.
+    latest = select(BalanceCheckpoint.group_id, BalanceCheckpoint.event_id, BalanceCheckpoint.balances) \
+        .distinct(BalanceCheckpoint.group_id) \
+        .order_by(BalanceCheckpoint.group_id, BalanceCheckpoint.event_id.desc())
+    if group_ids is not None:
+        latest = latest.where(BalanceCheckpoint.group_id.in_(group_ids))
+    latest = latest.subquery()
+
+    groups_query = select(Group.id, latest.c.event_id, latest.c.balances).outerjoin(latest, latest.c.group_id == Group.id)
+    if group_ids is not None:
+        groups_query = groups_query.where(Group.id.in_(group_ids))
+    state = {group_id: (dict(balances) if balances is not None else {}, event_id or 0, balances is not None)
+             for group_id, event_id, balances in db.session.execute(groups_query)}
+
+    events = select(LedgerEvent.group_id, LedgerEvent.id, LedgerEvent.entity_type, LedgerEvent.operation,
+                    LedgerEvent.deltas, LedgerEvent.payload) \
+        .outerjoin(latest, latest.c.group_id == LedgerEvent.group_id) \
+        .where(LedgerEvent.id > func.coalesce(latest.c.event_id, 0)) \
+        .order_by(LedgerEvent.group_id, LedgerEvent.id) \
+        .execution_options(yield_per=1000)
+    if group_ids is not None:
+        events = events.where(LedgerEvent.group_id.in_(group_ids))
+
+    for group_id, event_id, entity_type, operation, deltas, payload in db.session.execute(events):
+        balances, _, has_baseline = state[group_id]
+        if not has_baseline and entity_type == 'group' and operation == 'add':
+            has_baseline = True
+        state[group_id] = (apply_event(balances, entity_type, operation, deltas, payload), event_id, has_baseline)
+
+    return state
+
+
+def balances_match(expected, actual):
+    if set(expected) != set(actual or {}):
+        return False
+    return all(abs(expected[username] - (actual[username] or 0)) < BALANCE_TOLERANCE for username in expected)
+
+
+def audit_group_balances(group_ids=None):
+    # Returns (verified, drifted, missing_baseline) lists of group ids
+    replayed = replay_balances(group_ids)
+    current = dict(db.session.execute(select(Group.id, Group.balances).where(Group.id.in_(list(replayed)))).all())
+
+    verified, drifted, missing_baseline = [], [], []
+    for group_id, (balances, _, has_baseline) in replayed.items():
+        if not has_baseline:
+            missing_baseline.append(group_id)
+        elif balances_match(balances, current[group_id]):
+            verified.append(group_id)
+        else:
+            drifted.append(group_id)
+    return verified, drifted, missing_baseline
+
+
+def rebuild_group_balances(group_id):
+    # Lock the group first so no write lands between the replay and the overwrite
+    group = Group.query.with_for_update().filter_by(id=group_id).first()
+    balances, last_event_id, _ = replay_balances([group_id])[group_id]
+    group.balances = {username: round(balance, 2) for username, balance in balances.items()}
+    if last_event_id:
+        write_checkpoint(group, last_event_id)
+    return group.balances
+
+
+def checkpoint_group(group_id):
+    # Trusts the current balances; used to give groups created before the ledger a baseline
+    group = Group.query.with_for_update().filter_by(id=group_id).first()
+    last_event_id = db.session.query(func.max(LedgerEvent.id)).filter_by(group_id=group_id).scalar() or 0
+    return write_checkpoint(group, last_event_id)
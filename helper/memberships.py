@@ -0,0 +1,60 @@
+from sqlalchemy import text
+from backend.db import db
+from backend.models.group_membership import GroupMembership
+
+LOOKUP_COLUMNS = ('username', 'upi_id')
+
+
+def sync_group_memberships(group):
+    # Member changes are rare, so the group's rows are simply rewritten from Group.usernames
+    if group.id is None:
+        db.session.flush()
+    GroupMembership.query.filter_by(group_id=group.id).delete(synchronize_session=False)
+    rows = [{'group_id': group.id, 'username': user['username'], 'upi_id': user.get('upi_id')} for user in group.usernames]
+    if rows:
+        db.session.execute(GroupMembership.__table__.insert(), rows)
+
+
+# Balances are read from the group row itself, so the index never has to track them
+POSITIONS_SQL = """
+SELECT g.id AS group_id, g.name, g.version, m.username, COALESCE((g.balances ->> m.username)::float, 0) AS balance
+FROM group_memberships m
+JOIN groups g ON g.id = m.group_id
+WHERE m.{column} = :identifier
+ORDER BY g.id
+"""
+
+
+def load_positions(identifier, column='username'):
+    rows = db.session.execute(text(POSITIONS_SQL.format(column=column)), {'identifier': identifier}).mappings().all()
+    groups = [dict(row) for row in rows]
+    owed_to_you = sum(row['balance'] for row in groups if row['balance'] > 0)
+    you_owe = -sum(row['balance'] for row in groups if row['balance'] < 0)
+    return {'groups': groups, 'owed_to_you': owed_to_you, 'you_owe': you_owe, 'net': owed_to_you - you_owe}
+
+
+BACKFILL_MEMBERSHIPS_SQL = """
+INSERT INTO group_memberships (group_id, username, upi_id)
+SELECT g.id, u.value ->> 'username', u.value ->> 'upi_id'
+FROM groups g CROSS JOIN LATERAL jsonb_array_elements(g.usernames) AS u
+WHERE g.id > :after_id AND g.id <= :until_id
+ON CONFLICT (group_id, username) DO UPDATE SET upi_id = excluded.upi_id
+"""
+
+
+def backfill_group_memberships(batch_size=1000):
+    # Walks groups by id in batches, committing after each one so it can run against a live database
+    after_id = 0
+    batches = 0
+    while True:
+        until_id = db.session.execute(
+            text("SELECT MAX(id) FROM (SELECT id FROM groups WHERE id > :after_id ORDER BY id LIMIT :batch_size) b"),
+            {'after_id': after_id, 'batch_size': batch_size}).scalar()
+        if until_id is None:
+            return batches
+        # Each batch is its own transaction, so the timeout is lifted again for every one
+        db.session.execute(text("SET LOCAL statement_timeout = 0"))
+        db.session.execute(text(BACKFILL_MEMBERSHIPS_SQL), {'after_id': after_id, 'until_id': until_id})
+        db.session.commit()
+        after_id = until_id
+        batches += 1
@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from flask import g, request, current_app, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('backend.slow_requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class MetricsRegistry:
+    # Minimal Prometheus-style registry: labelled counters and histograms plus gauges that
+    # are read from a callback at scrape time, rendered in the text exposition format.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def counter(self, name, help_text):
+        self._metrics[name] = ('counter', help_text, None)
+
+    def histogram(self, name, help_text, buckets):
+        self._metrics[name] = ('histogram', help_text, buckets)
+
+    def collector(self, name, help_text, callback, kind='gauge'):
+        # Values owned elsewhere (e.g. cache counters) are read at scrape time; callback returns
+        # {labels: value} where labels is a tuple of (key, value) pairs
+        self._metrics[name] = (kind, help_text, callback)
+
+    def inc(self, name, labels=(), amount=1):
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = self._metrics[name][2]
+        with self._lock:
+            key = (name, labels)
+            counts, total, count = self._histograms.get(key, ((0,) * len(buckets), 0, 0))
+            counts = tuple(bucket_count + (value <= bound) for bucket_count, bound in zip(counts, buckets))
+            self._histograms[key] = (counts, total + value, count + 1)
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+
+        lines = []
+        for name, (kind, help_text, extra) in self._metrics.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if callable(extra):
+                for labels, value in extra().items():
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            elif kind == 'counter':
+                for (metric, labels), value in counters.items():
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+            elif kind == 'histogram':
+                for (metric, labels), (counts, total, count) in histograms.items():
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(extra, counts):
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {bucket_count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.histogram('splitter_request_duration_seconds', 'Request latency by endpoint.', LATENCY_BUCKETS)
+metrics.histogram('splitter_request_queries', 'SQL statements issued per request.', QUERY_COUNT_BUCKETS)
+metrics.histogram('splitter_write_batch_size', 'Writes applied per group commit when WRITE_BATCHING_ENABLED.', BATCH_SIZE_BUCKETS)
+metrics.counter('splitter_requests_total', 'Requests by endpoint and status.')
+metrics.counter('splitter_sql_queries_total', 'SQL statements by endpoint.')
+metrics.counter('splitter_sql_seconds_total', 'Time spent in SQL by endpoint.')
+metrics.counter('splitter_sql_rows_total', 'Rows returned or affected by SQL statements, by endpoint.')
+metrics.counter('splitter_slow_requests_total', 'Requests slower than SLOW_REQUEST_THRESHOLD.')
+
+
+def _endpoint_labels():
+    return (('endpoint', request.endpoint or 'unmatched'), ('method', request.method))
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_start'] = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('query_start', time.perf_counter())
+    if not has_request_context() or 'sql' not in g:
+        return
+    sql = g.sql
+    sql['count'] += 1
+    sql['seconds'] += elapsed
+    sql['rows'] += max(cursor.rowcount, 0)
+    if len(sql['statements']) < sql['keep']:
+        sql['statements'].append((round(elapsed * 1000, 2), statement))
+
+
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.sql = {'count': 0, 'seconds': 0.0, 'rows': 0, 'statements': [],
+             'keep': current_app.config['SLOW_REQUEST_MAX_STATEMENTS']}
+
+
+def finish_request_metrics(response):
+    if 'request_start' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_start
+    labels = _endpoint_labels()
+    sql = g.sql
+
+    metrics.observe('splitter_request_duration_seconds', labels, elapsed)
+    metrics.observe('splitter_request_queries', labels, sql['count'])
+    metrics.inc('splitter_requests_total', labels + (('status', response.status_code),))
+    metrics.inc('splitter_sql_queries_total', labels, sql['count'])
+    metrics.inc('splitter_sql_seconds_total', labels, sql['seconds'])
+    metrics.inc('splitter_sql_rows_total', labels, sql['rows'])
+
+    if elapsed >= current_app.config['SLOW_REQUEST_THRESHOLD']:
+        metrics.inc('splitter_slow_requests_total', labels)
+        statements = '\n'.join(f"  [{ms}ms] {statement}" for ms, statement in sql['statements'])
+        logger.warning("Slow request %s %s took %.3fs with %d queries (%.3fs in SQL):\n%s",
+                       request.method, request.full_path, elapsed, sql['count'], sql['seconds'], statements)
+    return response
+
+
+def init_metrics(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.before_request(start_request_metrics)
+    app.after_request(finish_request_metrics)
+    # Registered on the Engine class, so every engine the app creates is instrumented
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
@@ -0,0 +1,191 @@
+import importlib
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from backend.db import db
+from backend.models.receipt_job import ReceiptJob
+
+AMOUNT_LINE = re.compile(r'^(?P<description>.*?)[\s:]+(?P<amount>-?\d+(?:[.,]\d{1,2})?)\s*$')
+RUNNING_GRACE = 60  # seconds past OCR_JOB_TIMEOUT before a running job counts as abandoned
+
+
+class ReceiptParseError(Exception):
+    pass
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class StubBackend:
+    # Stand-in for a real OCR engine: reads 'description amount' lines from a text "image",
+    # treating TAX, DISCOUNT and TOTAL lines as bill-level values.
+
+    def parse(self, image_path):
+        with open(image_path, 'rb') as image:
+            try:
+                text = image.read().decode('utf-8')
+            except UnicodeDecodeError:
+                raise ReceiptParseError("Stub backend only reads text receipts")
+
+        result = {'items': [], 'tax': 0, 'discount': 0, 'total': None}
+        for line in text.splitlines():
+            match = AMOUNT_LINE.match(line.strip())
+            if not match:
+                continue
+            description = match.group('description').strip()
+            amount = float(match.group('amount').replace(',', '.'))
+            label = description.lower()
+            if label in ('tax', 'gst', 'vat'):
+                result['tax'] += amount
+            elif label == 'discount':
+                result['discount'] += abs(amount)
+            elif label == 'total':
+                result['total'] = amount
+            else:
+                result['items'].append({'description': description, 'amount': amount})
+        return result
+
+
+OCR_BACKENDS = {'stub': StubBackend}
+
+
+def load_backend(name):
+    # Either a registered name or a 'package.module:ClassName' path
+    if name in OCR_BACKENDS:
+        return OCR_BACKENDS[name]()
+    module_name, _, class_name = name.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def discard_image(image_path):
+    # The upload is only needed until its job reaches 'done' or 'failed'
+    try:
+        os.remove(image_path)
+    except FileNotFoundError:
+        pass
+
+
+def run_backend(backend_name, image_path, connection):
+    # Runs inside the worker process; the outcome goes back over the pipe
+    try:
+        connection.send(('done', load_backend(backend_name).parse(image_path)))
+    except Exception as e:
+        connection.send(('failed', f"{type(e).__name__}: {e}"))
+    finally:
+        connection.close()
+
+
+class ReceiptJobRunner:
+    # At most `workers` parse processes run at once and at most `max_queue` more jobs wait.
+    # Every job gets its own process so a receipt that overruns its timeout can be killed
+    # without taking a shared pool worker down with it.
+
+    def __init__(self):
+        self.app = None
+        self._executor = None
+        self._slots = None
+        self._recovered = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.backend = app.config['OCR_BACKEND']
+        self.workers = app.config['OCR_WORKERS']
+        self.max_queue = app.config['OCR_MAX_QUEUE']
+        self.timeout = app.config['OCR_JOB_TIMEOUT']
+        # On the first request rather than here, so CLI commands never pick up jobs
+        app.before_request(self._recover_once)
+
+    def _recover_once(self):
+        with self._lock:
+            if self._recovered:
+                return
+            self._recovered = True
+        self.recover()
+
+    def recover(self):
+        # Jobs left behind by a stopped process. A running job past its timeout can't still be
+        # running anywhere, so it fails; queued jobs are queued again here, and whichever process
+        # claims one first runs it.
+        with self.app.app_context():
+            cutoff = datetime.now() - timedelta(seconds=self.timeout + RUNNING_GRACE)
+            for job in ReceiptJob.query.filter(ReceiptJob.status == 'running', ReceiptJob.updated_at < cutoff):
+                job.status = 'failed'
+                job.error = "Interrupted before it finished"
+                discard_image(job.image_path)
+            queued = [(job.id, job.image_path) for job in ReceiptJob.query.filter_by(status='queued').order_by(ReceiptJob.id)]
+            db.session.commit()
+
+        for job_id, image_path in queued:
+            try:
+                self.submit(job_id, image_path)
+            except QueueFullError:
+                if self._update(job_id, expected_status='queued', status='failed', error="Receipt queue is full"):
+                    discard_image(image_path)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='receipt-job')
+                self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+
+    def submit(self, job_id, image_path):
+        self._ensure_started()
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError()
+        future = self._executor.submit(self._run, job_id, image_path)
+        future.add_done_callback(lambda _: self._slots.release())
+
+    def _run(self, job_id, image_path):
+        # Claimed atomically, since a recovering process may have queued the same job
+        if not self._update(job_id, expected_status='queued', status='running'):
+            return
+
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.get_context('spawn').Process(
+            target=run_backend, args=(self.backend, image_path, sender), daemon=True)
+        process.start()
+        sender.close()
+
+        if receiver.poll(self.timeout):
+            try:
+                status, outcome = receiver.recv()
+            except EOFError:
+                status, outcome = 'failed', "Parser exited without a result"
+        else:
+            status, outcome = 'failed', f"Timed out after {self.timeout}s"
+        process.join(1)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+        receiver.close()
+
+        if status == 'done':
+            self._update(job_id, status='done', result=outcome)
+        else:
+            self._update(job_id, status='failed', error=outcome)
+        discard_image(image_path)
+
+    def _update(self, job_id, expected_status=None, **values):
+        # Returns whether the job was updated; with expected_status, only a job still in that status is
+        with self.app.app_context():
+            query = ReceiptJob.query.filter_by(id=job_id)
+            if expected_status is not None:
+                query = query.filter_by(status=expected_status)
+            updated = query.update({**values, 'updated_at': datetime.now()}, synchronize_session=False)
+            db.session.commit()
+            return bool(updated)
+
+    def stats(self):
+        # Running plus waiting jobs, for sizing the pool
+        if self._slots is None:
+            return {'in_flight': 0, 'capacity': self.workers + self.max_queue}
+        capacity = self.workers + self.max_queue
+        return {'in_flight': capacity - self._slots._value, 'capacity': capacity}
+
+
+receipt_jobs = ReceiptJobRunner()
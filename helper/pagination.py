@@ -0,0 +1,65 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+def encode_cursor(moment, row_id):
+    raw = json.dumps([moment.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        moment, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(moment), int(row_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidPageRequest("Invalid cursor")
+
+
+def is_paginated(args):
+    return 'limit' in args or 'after' in args
+
+
+def parse_page_args(args):
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise InvalidPageRequest("limit must be an integer")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise InvalidPageRequest(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    after = args.get('after')
+    return limit, decode_cursor(after) if after else None
+
+
+def page_query(query, datetime_column, id_column, limit, after=None):
+    # Keyset pagination over (datetime, id) DESC: the row-value comparison lets postgres
+    # seek straight into the (group_id, datetime, id) index, so every page costs the same.
+    # Works on ORM queries and on select() statements alike.
+    if after:
+        query = query.filter(tuple_(datetime_column, id_column) < after)
+    return query.order_by(datetime_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def paginate(query, datetime_column, id_column, limit, after=None):
+    return finish_page(page_query(query, datetime_column, id_column, limit, after).all(), datetime_column, id_column, limit)
+
+
+def finish_page(rows, datetime_column, id_column, limit):
+    # page_query fetches one extra row to learn whether another page follows
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, datetime_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
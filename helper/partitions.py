@@ -0,0 +1,214 @@
+import re
+from datetime import date, datetime, timezone
+from sqlalchemy import func, text
+from sqlalchemy.schema import CreateIndex
+from backend.db import db
+from backend.models.group import Group
+from backend.models.transaction import Transaction
+from backend.models.payment import Payment
+from backend.models.history_archive import TransactionArchive, PaymentArchive
+from backend.helper.filters import SEARCH_VECTOR_DDL
+from backend.helper.ledger import checkpoint_group
+from backend.helper.versioning import bump_group_version
+
+# table -> (partition key, model, archive model)
+PARTITIONED_TABLES = {
+    'transactions': ('datetime_transaction', Transaction, TransactionArchive),
+    'payments': ('datetime_payment', Payment, PaymentArchive),
+}
+PARTITION_NAME = re.compile(r'^(?P<table>\w+)_y(?P<year>\d{4})m(?P<month>\d{2})$')
+FRACTIONAL_SECONDS = re.compile(r'\.(\d{1,6})')
+
+
+def month_start(moment):
+    moment = moment.astimezone(timezone.utc) if isinstance(moment, datetime) else moment
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def is_partitioned(table):
+    return db.session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table)"), {'table': table}).scalar()
+
+
+def month_partitions(table):
+    # (name, month) for each monthly partition, oldest first; the default partition is left out
+    names = db.session.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table"), {'table': table}).scalars()
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match and match.group('table') == table:
+            partitions.append((name, date(int(match.group('year')), int(match.group('month')), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_month_partitions(parent, table, first_month, last_month):
+    # Bounds are UTC month starts; IF NOT EXISTS makes this safe to run from cron
+    month, created = first_month, 0
+    while month <= last_month:
+        following = add_months(month, 1)
+        db.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {parent} "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{following.isoformat()} 00:00:00+00')"))
+        month, created = following, created + 1
+    return created
+
+
+def create_upcoming_partitions(months_ahead):
+    this_month = month_start(datetime.now(timezone.utc))
+    return {table: create_month_partitions(table, table, this_month, add_months(this_month, months_ahead))
+            for table in PARTITIONED_TABLES if is_partitioned(table)}
+
+
+def partition_history_table(table, months_ahead):
+    # Rebuilds the table as PARTITION BY RANGE on its datetime column, one partition per month
+    # plus a default partition, copying every row. Holds an exclusive lock for the whole copy.
+    key, model, _ = PARTITIONED_TABLES[table]
+    if is_partitioned(table):
+        return None
+
+    staging = f"{table}_partitioned"
+    columns = ', '.join(column.name for column in model.__table__.columns if column.computed is None)
+    # The copy can run far past DB_STATEMENT_TIMEOUT_MS
+    db.session.execute(text("SET LOCAL statement_timeout = 0"))
+    db.session.execute(text(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE"))
+    if table == 'transactions':
+        db.session.execute(text(SEARCH_VECTOR_DDL))
+    db.session.execute(text(
+        f"CREATE TABLE {staging} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED) "
+        f"PARTITION BY RANGE ({key})"))
+    # The id sequence would otherwise be dropped along with the old table
+    db.session.execute(text(f"ALTER SEQUENCE {table}_id_seq OWNED BY {staging}.id"))
+
+    oldest, newest = db.session.execute(text(f"SELECT min({key}), max({key}) FROM {table}")).one()
+    this_month = month_start(datetime.now(timezone.utc))
+    first = month_start(oldest) if oldest else this_month
+    last = max(month_start(newest) if newest else this_month, this_month)
+    create_month_partitions(staging, table, first, add_months(last, months_ahead))
+    db.session.execute(text(f"CREATE TABLE {table}_default PARTITION OF {staging} DEFAULT"))
+
+    copied = db.session.execute(text(f"INSERT INTO {staging} ({columns}) SELECT {columns} FROM {table}")).rowcount
+    if table == 'transactions':
+        # A foreign key has to reference a unique key, and the partitioned one includes the datetime
+        db.session.execute(text("ALTER TABLE transaction_entries DROP CONSTRAINT IF EXISTS transaction_entries_transaction_id_fkey"))
+    db.session.execute(text(f"DROP TABLE {table}"))
+    db.session.execute(text(f"ALTER TABLE {staging} RENAME TO {table}"))
+    db.session.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, {key})"))
+    db.session.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_group_id_fkey FOREIGN KEY (group_id) REFERENCES groups (id)"))
+    for index in model.__table__.indexes:
+        db.session.execute(CreateIndex(index))
+    return copied
+
+
+# to_jsonb trims trailing zeros off fractional seconds, which Python 3.9's fromisoformat rejects,
+# so the partition key is written out at a fixed width in UTC
+ARCHIVE_SQL = """
+INSERT INTO {archive} (group_id, month, row_count, total_amount, rows, archived_at)
+SELECT group_id, :month, count(*), sum(amount),
+       jsonb_agg(to_jsonb(p) - 'search_vector' || jsonb_build_object('{key}',
+                 to_char({key} AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"+00:00"')) ORDER BY {key}, id), now()
+FROM {partition} p
+GROUP BY group_id
+ON CONFLICT (group_id, month) DO UPDATE SET
+    row_count = {archive}.row_count + excluded.row_count,
+    total_amount = {archive}.total_amount + excluded.total_amount,
+    rows = {archive}.rows || excluded.rows,
+    archived_at = excluded.archived_at
+RETURNING group_id
+"""
+
+
+def archive_history(older_than_months, compression='pglz'):
+    # Moves whole monthly partitions older than the horizon into the archive tables, one commit
+    # per partition. Balances are untouched (they're materialised on the group), but each affected
+    # group gets a checkpoint so audits have a baseline that doesn't depend on the archived months.
+    cutoff = add_months(month_start(datetime.now(timezone.utc)), -older_than_months)
+    archived = []
+    for table, (key, _, archive) in PARTITIONED_TABLES.items():
+        if not is_partitioned(table):
+            continue
+        db.session.execute(text(f"ALTER TABLE {archive.__tablename__} ALTER COLUMN rows SET COMPRESSION {compression}"))
+        for name, month in month_partitions(table):
+            if month >= cutoff:
+                break
+            db.session.execute(text("SET LOCAL statement_timeout = 0"))
+            group_ids = set(db.session.execute(text(ARCHIVE_SQL.format(
+                archive=archive.__tablename__, key=key, partition=name)), {'month': month}).scalars())
+            db.session.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            db.session.execute(text(f"DROP TABLE {name}"))
+            for group_id in sorted(group_ids):
+                checkpoint_group(group_id)
+                bump_group_version(Group.query.get(group_id))
+            db.session.commit()
+            archived.append((name, len(group_ids)))
+    return archived
+
+
+def parse_archived_datetime(value):
+    # Months archived before the key was written at a fixed width can have 1-6 fractional digits
+    return datetime.fromisoformat(FRACTIONAL_SECONDS.sub(lambda match: '.' + match.group(1).ljust(6, '0'), value, count=1))
+
+
+def archived_total_expenditure(group_id):
+    return db.session.query(func.sum(TransactionArchive.total_amount)).filter_by(group_id=group_id).scalar() or 0
+
+
+# Renames are applied in SQL, one archived month per row, so no month is loaded into Python
+RENAMED_USERNAMES = """(SELECT coalesce(jsonb_agg(CASE WHEN e.value ->> 'username' = :old_username
+                                       THEN e.value || jsonb_build_object('username', CAST(:new_username AS text))
+                                       ELSE e.value END ORDER BY e.position), '[]')
+ FROM jsonb_array_elements(CASE jsonb_typeof(r.value -> '{field}') WHEN 'array' THEN r.value -> '{field}' ELSE '[]' END)
+      WITH ORDINALITY AS e(value, position))"""
+RENAMED_PAID_FOR = """(SELECT coalesce(jsonb_agg(CASE WHEN e.value = to_jsonb(CAST(:old_username AS text))
+                                       THEN to_jsonb(CAST(:new_username AS text))
+                                       ELSE e.value END ORDER BY e.position), '[]')
+ FROM jsonb_array_elements(CASE jsonb_typeof(r.value -> 'paid_for') WHEN 'array' THEN r.value -> 'paid_for' ELSE '[]' END)
+      WITH ORDINALITY AS e(value, position))"""
+TRANSACTION_MENTIONS = """(r.value @> jsonb_build_object('paid_by', jsonb_build_array(jsonb_build_object('username', CAST(:old_username AS text))))
+  OR r.value @> jsonb_build_object('paid_for', jsonb_build_array(CAST(:old_username AS text)))
+  OR r.value @> jsonb_build_object('share_details', jsonb_build_array(jsonb_build_object('username', CAST(:old_username AS text)))))"""
+PAYMENT_MENTIONS = "(r.value ->> 'paid_from' = :old_username OR r.value ->> 'paid_to' = :old_username)"
+
+RENAME_ARCHIVED_TRANSACTIONS_SQL = f"""
+UPDATE transactions_archive a SET rows = (
+    SELECT jsonb_agg(CASE WHEN {TRANSACTION_MENTIONS}
+                          THEN r.value || jsonb_build_object('paid_by', {RENAMED_USERNAMES.format(field='paid_by')},
+                                                             'paid_for', {RENAMED_PAID_FOR},
+                                                             'share_details', {RENAMED_USERNAMES.format(field='share_details')})
+                          ELSE r.value END ORDER BY r.position)
+    FROM jsonb_array_elements(a.rows) WITH ORDINALITY AS r(value, position))
+WHERE a.group_id = :group_id
+  AND EXISTS (SELECT 1 FROM jsonb_array_elements(a.rows) AS r(value) WHERE {TRANSACTION_MENTIONS})
+"""
+
+RENAME_ARCHIVED_PAYMENTS_SQL = f"""
+UPDATE payments_archive a SET rows = (
+    SELECT jsonb_agg(r.value
+                     || CASE WHEN r.value ->> 'paid_from' = :old_username
+                             THEN jsonb_build_object('paid_from', CAST(:new_username AS text)) ELSE '{{}}' END
+                     || CASE WHEN r.value ->> 'paid_to' = :old_username
+                             THEN jsonb_build_object('paid_to', CAST(:new_username AS text)) ELSE '{{}}' END
+                     ORDER BY r.position)
+    FROM jsonb_array_elements(a.rows) WITH ORDINALITY AS r(value, position))
+WHERE a.group_id = :group_id
+  AND EXISTS (SELECT 1 FROM jsonb_array_elements(a.rows) AS r(value) WHERE {PAYMENT_MENTIONS})
+"""
+
+
+def rename_archived_member(group_id, old_username, new_username):
+    params = {'group_id': group_id, 'old_username': old_username, 'new_username': new_username}
+    db.session.execute(text(RENAME_ARCHIVED_TRANSACTIONS_SQL), params)
+    db.session.execute(text(RENAME_ARCHIVED_PAYMENTS_SQL), params)
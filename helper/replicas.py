@@ -0,0 +1,45 @@
+import random
+import time
+from functools import wraps
+from flask import g, request, current_app
+
+REPLICA_PREFIX = 'replica'
+STICKY_COOKIE = 'splitter_primary_until'
+
+
+def replica_binds():
+    return [key for key in current_app.config.get('SQLALCHEMY_BINDS') or {} if key.startswith(REPLICA_PREFIX)]
+
+
+def sticky_cookie_active(value):
+    # Set after this client's own write so it reads what it just wrote, not a lagging replica
+    try:
+        return float(value or 0) > time.time()
+    except ValueError:
+        return False
+
+
+def pinned_to_primary():
+    return sticky_cookie_active(request.cookies.get(STICKY_COOKIE))
+
+
+def read_only(view):
+    # Routes the view's queries to one replica, chosen per request so every read sees the same snapshot
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        replicas = replica_binds()
+        if replicas and not pinned_to_primary():
+            g.db_replica = random.choice(replicas)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def pin_after_write(response):
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and response.status_code < 400 and replica_binds():
+        window = current_app.config['REPLICA_STICKY_SECONDS']
+        response.set_cookie(STICKY_COOKIE, str(time.time() + window), max_age=window, httponly=True, samesite='Lax')
+    return response
+
+
+def init_replicas(app):
+    app.after_request(pin_after_write)
@@ -0,0 +1,167 @@
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import Date, cast, func, text
+from backend.db import db
+from backend.models.spending_rollup import DailySpending
+from backend.helper.partitions import month_start, add_months
+
+DAY = 'day'
+MONTH = 'month'
+GRANULARITIES = (DAY, MONTH)
+DEFAULT_BUCKETS = {DAY: 30, MONTH: 12}
+MAX_BUCKETS = {DAY: 366, MONTH: 120}
+
+
+class InvalidSeriesRequest(ValueError):
+    pass
+
+
+# One row per (group, member, UTC day) from any relation with the transactions columns below
+ROLLUP_SELECT = """
+SELECT t.group_id, e.value ->> 'username' AS member, (t.datetime_transaction AT TIME ZONE 'UTC')::date AS day,
+       SUM(CASE WHEN e.role = 'share' THEN (e.value ->> 'amount')::float ELSE 0 END) AS spent,
+       SUM(CASE WHEN e.role = 'payer' THEN (e.value ->> 'amount')::float ELSE 0 END) AS paid,
+       COUNT(DISTINCT t.id) AS transaction_count
+FROM ({source}) t
+CROSS JOIN LATERAL (
+    SELECT value, 'share' AS role FROM jsonb_array_elements(COALESCE(t.share_details, '[]'::jsonb))
+    UNION ALL
+    SELECT value, 'payer' AS role FROM jsonb_array_elements(COALESCE(t.paid_by, '[]'::jsonb))
+) e
+GROUP BY 1, 2, 3
+"""
+
+TRANSACTIONS_SOURCE = "SELECT id, group_id, datetime_transaction, paid_by, share_details FROM transactions"
+
+ARCHIVED_TRANSACTIONS_SOURCE = """
+SELECT (archived.value ->> 'id')::integer, a.group_id, (archived.value ->> 'datetime_transaction')::timestamptz,
+       archived.value -> 'paid_by', archived.value -> 'share_details'
+FROM transactions_archive a CROSS JOIN LATERAL jsonb_array_elements(a.rows) AS archived
+"""
+
+# Rows are sorted so that concurrent writers always lock the same days in the same order
+APPLY_ROLLUP_SQL = f"""
+INSERT INTO daily_spending (group_id, member, day, spent, paid, transaction_count)
+SELECT group_id, member, day, :sign * spent, :sign * paid, :sign * transaction_count
+FROM ({ROLLUP_SELECT.format(source=TRANSACTIONS_SOURCE + " WHERE id = ANY(:ids)")}) r
+ORDER BY group_id, member, day
+ON CONFLICT (group_id, member, day) DO UPDATE SET
+    spent = daily_spending.spent + excluded.spent,
+    paid = daily_spending.paid + excluded.paid,
+    transaction_count = daily_spending.transaction_count + excluded.transaction_count
+"""
+
+MERGE_ROLLUP_MEMBER_SQL = """
+INSERT INTO daily_spending (group_id, member, day, spent, paid, transaction_count)
+SELECT group_id, :new_username, day, spent, paid, transaction_count
+FROM daily_spending WHERE group_id = :group_id AND member = :old_username
+ORDER BY day
+ON CONFLICT (group_id, member, day) DO UPDATE SET
+    spent = daily_spending.spent + excluded.spent,
+    paid = daily_spending.paid + excluded.paid,
+    transaction_count = daily_spending.transaction_count + excluded.transaction_count
+"""
+
+# Archived months still count, read back out of their JSONB arrays
+REBUILD_ROLLUP_SQL = f"""
+INSERT INTO daily_spending (group_id, member, day, spent, paid, transaction_count)
+{ROLLUP_SELECT.format(source=f"SELECT * FROM ({TRANSACTIONS_SOURCE} UNION ALL {ARCHIVED_TRANSACTIONS_SOURCE}) s "
+                             "WHERE CAST(:group_id AS integer) IS NULL OR s.group_id = :group_id")}
+"""
+
+
+def apply_spending_rollup(transaction_ids, sign):
+    # Adds (sign=1) or takes back (sign=-1) the stored rows of these transactions. Reads the rows
+    # as written, so call it with -1 before a transaction changes and with 1 after.
+    if not transaction_ids:
+        return
+    db.session.flush()
+    db.session.execute(text(APPLY_ROLLUP_SQL), {'ids': list(transaction_ids), 'sign': sign})
+
+
+def rename_spending_rollup(group_id, old_username, new_username):
+    # Folded into the new name's days, which exist when a deleted member's name is deleted again
+    params = {'group_id': group_id, 'old_username': old_username, 'new_username': new_username}
+    db.session.execute(text(MERGE_ROLLUP_MEMBER_SQL), params)
+    DailySpending.query.filter_by(group_id=group_id, member=old_username).delete(synchronize_session=False)
+
+
+def rebuild_spending_rollup(group_id=None):
+    query = DailySpending.query
+    if group_id is not None:
+        query = query.filter_by(group_id=group_id)
+    # A full rebuild, including the delete of every existing row, can run far past DB_STATEMENT_TIMEOUT_MS
+    db.session.execute(text("SET LOCAL statement_timeout = 0"))
+    query.delete(synchronize_session=False)
+    db.session.execute(text(REBUILD_ROLLUP_SQL), {'group_id': group_id})
+
+
+def parse_date(args, key):
+    value = args.get(key)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise InvalidSeriesRequest(f"{key} must be a date (YYYY-MM-DD)")
+
+
+def series_buckets(args):
+    granularity = args.get('granularity', DAY)
+    if granularity not in GRANULARITIES:
+        raise InvalidSeriesRequest(f"Invalid granularity. Choose one of: {', '.join(GRANULARITIES)}")
+
+    last = parse_date(args, 'to') or datetime.now(timezone.utc).date()
+    first = parse_date(args, 'from')
+    if granularity == DAY:
+        first = first or last - timedelta(days=DEFAULT_BUCKETS[DAY] - 1)
+        count = (last - first).days + 1
+    else:
+        last = month_start(last)
+        first = month_start(first) if first else add_months(last, 1 - DEFAULT_BUCKETS[MONTH])
+        count = (last.year - first.year) * 12 + last.month - first.month + 1
+
+    if count < 1:
+        raise InvalidSeriesRequest("from must not be after to")
+    if count > MAX_BUCKETS[granularity]:
+        raise InvalidSeriesRequest(f"At most {MAX_BUCKETS[granularity]} {granularity} buckets per request")
+    if granularity == DAY:
+        buckets = [first + timedelta(days=offset) for offset in range(count)]
+    else:
+        buckets = [add_months(first, offset) for offset in range(count)]
+    return granularity, buckets
+
+
+def load_spending_series(group_id, granularity, buckets, members=None):
+    # Reads at most one row per member and day in range, however many transactions the group has
+    period = DailySpending.day if granularity == DAY else cast(func.date_trunc('month', DailySpending.day), Date)
+    last_day = buckets[-1] if granularity == DAY else add_months(buckets[-1], 1) - timedelta(days=1)
+    query = db.session.query(DailySpending.member, period, func.sum(DailySpending.spent), func.sum(DailySpending.paid),
+                             func.sum(DailySpending.transaction_count)) \
+        .filter(DailySpending.group_id == group_id, DailySpending.day.between(buckets[0], last_day),
+                DailySpending.transaction_count > 0)
+    if members:
+        query = query.filter(DailySpending.member.in_(members))
+
+    def empty_series():
+        return {'spent': [0] * len(buckets), 'paid': [0] * len(buckets), 'transaction_count': [0] * len(buckets)}
+
+    # Buckets without activity are zero-filled so every list lines up with periods
+    index = {bucket: position for position, bucket in enumerate(buckets)}
+    total_spent = [0] * len(buckets)
+    series = {member: empty_series() for member in members or []}
+    for member, bucket, spent, paid, count in query.group_by(DailySpending.member, period):
+        position = index[bucket]
+        entry = series.setdefault(member, empty_series())
+        entry['spent'][position] = spent
+        entry['paid'][position] = paid
+        entry['transaction_count'][position] = int(count)
+        total_spent[position] += spent
+
+    return {
+        'granularity': granularity,
+        'from': buckets[0].isoformat(),
+        'to': last_day.isoformat(),
+        'periods': [bucket.isoformat() for bucket in buckets],
+        'total_spent': total_spent,
+        'members': dict(sorted(series.items()))
+    }
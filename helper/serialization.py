@@ -0,0 +1,116 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import request, has_request_context
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def encode_default(value):
+    # Dates go out as ISO 8601, the same as the models' to_dict
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def stdlib_dumps(obj, sort_keys=True, indent=False):
+    separators = None if indent else (',', ':')
+    return json.dumps(obj, default=encode_default, sort_keys=sort_keys, indent=2 if indent else None,
+                      separators=separators).encode()
+
+
+def orjson_dumps(obj, sort_keys=True, indent=False):
+    # orjson formats datetimes itself, identically to isoformat()
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=encode_default, option=option)
+
+
+JSON_ENCODERS = {'json': stdlib_dumps, 'orjson': orjson_dumps}
+
+
+def json_backend(name):
+    # orjson is optional; without it the standard library encoder is used
+    if name == 'orjson' and orjson is None:
+        return 'json'
+    if name not in JSON_ENCODERS:
+        raise ValueError(f"Unknown JSON_BACKEND {name!r}. Choose one of: {', '.join(JSON_ENCODERS)}")
+    return name
+
+
+def prefers_msgpack(accept_header):
+    # Only when the client ranks MessagePack above JSON; */* and missing headers get JSON
+    if msgpack is None or not accept_header:
+        return False
+    accept = parse_accept_header(accept_header, MIMEAccept)
+    return accept.best_match((JSON_MIMETYPE, *MSGPACK_MIMETYPES)) in MSGPACK_MIMETYPES
+
+
+def wants_msgpack():
+    return has_request_context() and prefers_msgpack(request.headers.get('Accept'))
+
+
+class NegotiatingJSONProvider(DefaultJSONProvider):
+    # jsonify() goes through response(), so every endpoint gets the configured encoder and
+    # answers in MessagePack when the Accept header asks for it
+    backend = 'json'
+    default = staticmethod(encode_default)
+
+    def dumps(self, obj, **kwargs):
+        if self.backend == 'orjson' and not kwargs.get('cls'):
+            return orjson_dumps(obj, kwargs.get('sort_keys', self.sort_keys), bool(kwargs.get('indent'))).decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.backend == 'orjson' and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if wants_msgpack():
+            response = self._app.response_class(msgpack.packb(obj, default=encode_default), mimetype=MSGPACK_MIMETYPES[0])
+        else:
+            indent = (self.compact is None and self._app.debug) or self.compact is False
+            body = JSON_ENCODERS[self.backend](obj, self.sort_keys, indent)
+            response = self._app.response_class(body + b'\n', mimetype=self.mimetype)
+        if msgpack is not None:
+            response.vary.add('Accept')
+        return response
+
+
+def init_serialization(app):
+    provider = type('JSONProvider', (NegotiatingJSONProvider,), {'backend': json_backend(app.config['JSON_BACKEND'])})
+    app.json = provider(app)
+
+
+def history_columns(model):
+    # The stored columns, which are exactly what to_dict emits; generated ones (search_vector) are left out
+    return [column for column in model.__table__.columns if column.computed is None]
+
+
+def serialize_rows(rows):
+    # Column tuples straight to dicts, skipping ORM hydration; the encoder handles the datetimes
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, row)) for row in rows]
@@ -0,0 +1,143 @@
+import heapq
+import time
+
+GREEDY = 'greedy'
+MIN_TRANSFERS = 'min_transfers'
+SETTLEMENT_MODES = (GREEDY, MIN_TRANSFERS)
+
+# The exact solver walks every subset of the non-zero members, so it is only
+# attempted for small groups and always inside a time budget.
+MAX_EXACT_MEMBERS = 20
+DEFAULT_TIME_BUDGET = 0.5  # seconds
+
+
+class SettlementTimeout(Exception):
+    pass
+
+
+def to_cents(balances):
+    # Work in integer minor units so that float noise never leaves a 0.0000001 transfer behind
+    cents = {}
+    for user, balance in balances.items():
+        amount = round((balance or 0) * 100)
+        if amount:
+            cents[user] = amount
+    return cents
+
+
+def _settlement(creditor, debtor, amount):
+    return {
+        "creditor": creditor,
+        "debtor": debtor,
+        "amount": amount / 100
+    }
+
+
+def _greedy_cents(cents):
+    # Max-heaps keyed on the outstanding amount, ties broken by username for stable output
+    creditors = [(-amount, user) for user, amount in cents.items() if amount > 0]
+    debtors = [(amount, user) for user, amount in cents.items() if amount < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    settlements = []
+    while creditors and debtors:
+        credit_amount, creditor = heapq.heappop(creditors)
+        debt_amount, debtor = heapq.heappop(debtors)
+        credit_amount, debt_amount = -credit_amount, -debt_amount
+
+        settlement_amount = min(credit_amount, debt_amount)
+        settlements.append(_settlement(creditor, debtor, settlement_amount))
+
+        if credit_amount > settlement_amount:
+            heapq.heappush(creditors, (settlement_amount - credit_amount, creditor))
+        if debt_amount > settlement_amount:
+            heapq.heappush(debtors, (settlement_amount - debt_amount, debtor))
+
+    return settlements
+
+
+def settle_up_greedy(balances):
+    return _greedy_cents(to_cents(balances))
+
+
+def _zero_sum_partition(users, amounts, deadline):
+    # best[mask] is the largest number of disjoint zero-sum subsets that the members
+    # in mask can be split into; each such subset of k members settles in k - 1 transfers.
+    n = len(amounts)
+    size = 1 << n
+    sums = [0] * size
+    best = [0] * size
+    bits = [1 << i for i in range(n)]
+
+    for mask in range(1, size):
+        if not mask & 0xFFF and time.perf_counter() > deadline:
+            raise SettlementTimeout()
+        low = mask & -mask
+        total = sums[mask ^ low] + amounts[low.bit_length() - 1]
+        sums[mask] = total
+        value = 0
+        for bit in bits:
+            if mask & bit and best[mask ^ bit] > value:
+                value = best[mask ^ bit]
+        best[mask] = value + (total == 0)
+
+    # Walk back from the full set; every zero-sum mask on the path closes a subset
+    groups = []
+    mask = size - 1
+    current = {}
+    while mask:
+        target = best[mask] - (sums[mask] == 0)
+        for i, bit in enumerate(bits):
+            if mask & bit and best[mask ^ bit] == target:
+                break
+        current[users[i]] = amounts[i]
+        mask ^= bit
+        if sums[mask] == 0:
+            groups.append(current)
+            current = {}
+
+    return groups
+
+
+def settle_up_min_transfers(balances, time_budget=DEFAULT_TIME_BUDGET):
+    deadline = time.perf_counter() + time_budget
+    cents = to_cents(balances)
+    if sum(cents.values()) != 0:
+        raise ValueError("Balances do not sum to zero")
+
+    # A debtor who owes exactly what some creditor is owed is always settled in one transfer
+    settlements = []
+    open_credits = {}
+    for user, amount in sorted(cents.items()):
+        if amount > 0:
+            open_credits.setdefault(amount, []).append(user)
+    remaining = {}
+    for user, amount in sorted(cents.items()):
+        if amount < 0 and open_credits.get(-amount):
+            creditor = open_credits[-amount].pop()
+            settlements.append(_settlement(creditor, user, -amount))
+        elif amount < 0:
+            remaining[user] = amount
+    for amount, users in open_credits.items():
+        for user in users:
+            remaining[user] = amount
+
+    if len(remaining) > MAX_EXACT_MEMBERS:
+        raise SettlementTimeout()
+
+    users = sorted(remaining)
+    for group in _zero_sum_partition(users, [remaining[user] for user in users], deadline):
+        settlements.extend(_greedy_cents(group))
+
+    return settlements
+
+
+def settle_up(balances, mode=GREEDY, time_budget=DEFAULT_TIME_BUDGET):
+    if mode == MIN_TRANSFERS:
+        try:
+            return settle_up_min_transfers(balances, time_budget)
+        except (SettlementTimeout, ValueError):
+            # Too many members, too slow or unbalanced input: the greedy plan is always valid
+            pass
+    return settle_up_greedy(balances)
@@ -0,0 +1,126 @@
+import numpy as np
+
+EQUAL = 'equal'
+PERCENTAGE = 'percentage'
+SHARES = 'shares'
+ITEMIZED = 'itemized'
+SPLIT_MODES = (EQUAL, PERCENTAGE, SHARES, ITEMIZED)
+
+MINOR_UNITS = 100
+
+
+class SplitError(ValueError):
+    pass
+
+
+def to_minor_units(amount):
+    return int(round(amount * MINOR_UNITS))
+
+
+def amounts_match(amount, entries):
+    # Compare in minor units so that 0.1 + 0.2 style float noise never fails validation
+    return sum(to_minor_units(entry['amount']) for entry in entries) == to_minor_units(amount)
+
+
+def allocate(totals, weights):
+    # Largest-remainder allocation of integer totals (one per row) over the weight columns.
+    # Each row of the result is non-negative and sums exactly to its total; leftover units go
+    # to the largest fractional parts, ties broken by column order.
+    totals = np.asarray(totals, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    row_weights = weights.sum(axis=1)
+    if (weights < 0).any() or (row_weights <= 0).any():
+        raise SplitError("Every line must have positive weights")
+
+    quotas = totals[:, None] * (weights / row_weights[:, None])
+    base = np.floor(quotas).astype(np.int64)
+    shortfall = totals - base.sum(axis=1)
+
+    columns = weights.shape[1]
+    order = np.argsort(-(quotas - base), axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(columns), order.shape), axis=1)
+    # Float rounding can overshoot by a unit; that is taken back from the smallest remainders
+    return base + (ranks < shortfall[:, None]) - (ranks >= columns + shortfall[:, None])
+
+
+def _weighted(members, weights, amount):
+    if not members:
+        raise SplitError("At least one member is required")
+    return allocate([to_minor_units(amount)], [weights])[0]
+
+
+def _itemized(spec, members, index):
+    items = spec.get('items') or []
+    if not items:
+        raise SplitError("Itemized splits need at least one item")
+
+    # Dense item x member weight matrix; a whole bill is allocated in one vectorized pass
+    weights = np.zeros((len(items), len(members)), dtype=np.float64)
+    cents = np.empty(len(items), dtype=np.int64)
+    for row, item in enumerate(items):
+        cents[row] = to_minor_units(item['amount'])
+        item_weights = item.get('weights') or {username: 1 for username in item.get('members') or []}
+        for username, weight in item_weights.items():
+            weights[row, index[username]] = weight
+    if (cents < 0).any():
+        raise SplitError("Item amounts must not be negative")
+    subtotals = allocate(cents, weights).sum(axis=0)
+
+    # Tax and discount follow each member's share of the item subtotal
+    tax = to_minor_units(spec.get('tax', 0))
+    discount = to_minor_units(spec.get('discount', 0))
+    if tax < 0 or discount < 0:
+        raise SplitError("tax and discount must not be negative")
+    if discount > subtotals.sum() + tax:
+        raise SplitError("discount exceeds the bill total")
+    if tax or discount:
+        adjustments = allocate([tax, discount], np.vstack([subtotals, subtotals]))
+        subtotals = subtotals + adjustments[0] - adjustments[1]
+    return subtotals
+
+
+def split_bill(spec):
+    # Returns (amount, share_details) with share_details in the shape Transaction expects
+    if not isinstance(spec, dict):
+        raise SplitError("Split must be a JSON object")
+    mode = spec.get('mode')
+    if mode not in SPLIT_MODES:
+        raise SplitError(f"Invalid split mode. Choose one of: {', '.join(SPLIT_MODES)}")
+
+    try:
+        if mode == EQUAL:
+            members = list(spec.get('members') or [])
+            cents = _weighted(members, [1] * len(members), spec['amount'])
+        elif mode == PERCENTAGE:
+            percentages = spec.get('percentages') or {}
+            if abs(sum(percentages.values()) - 100) > 1e-6:
+                raise SplitError("Percentages must add up to 100")
+            members = list(percentages)
+            cents = _weighted(members, list(percentages.values()), spec['amount'])
+        elif mode == SHARES:
+            shares = spec.get('shares') or {}
+            members = list(shares)
+            cents = _weighted(members, list(shares.values()), spec['amount'])
+        else:
+            members = list(dict.fromkeys(username for item in spec.get('items') or []
+                                         for username in item.get('weights') or item.get('members') or []))
+            cents = _itemized(spec, members, {username: i for i, username in enumerate(members)})
+    except (KeyError, TypeError, AttributeError) as e:
+        raise SplitError(f"Malformed split: {e}")
+
+    share_details = [{'username': username, 'amount': int(amount) / MINOR_UNITS}
+                     for username, amount in zip(members, cents) if amount]
+    return int(cents.sum()) / MINOR_UNITS, share_details
+
+
+def expand_split(data):
+    # Fills share_details (and amount, paid_for, mode when absent) from a 'split' spec
+    if 'split' not in data or 'share_details' in data:
+        return data
+    amount, share_details = split_bill(data['split'])
+    data['share_details'] = share_details
+    data.setdefault('amount', amount)
+    data.setdefault('paid_for', [share['username'] for share in share_details])
+    data.setdefault('mode', data['split'].get('mode'))
+    return data
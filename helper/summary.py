@@ -0,0 +1,54 @@
+from sqlalchemy import text
+from backend.db import db
+
+# Fields served from the group row itself (cached snapshot) or derived from it in Python
+GROUP_FIELDS = ('members', 'balances', 'settlements')
+# Fields gathered by the single aggregate statement below, one scalar subquery each
+QUERY_FIELDS = {
+    'total_expenditure': "((SELECT coalesce(sum(amount), 0) FROM transactions WHERE group_id = :group_id) + "
+                         "(SELECT coalesce(sum(total_amount), 0) FROM transactions_archive WHERE group_id = :group_id))",
+    'user_expenditure': "(SELECT coalesce(json_object_agg(username, total_spent), '{}') FROM group_member_totals "
+                        "WHERE group_id = :group_id AND transaction_count > 0)",
+    'transactions': "(SELECT coalesce(json_agg(t ORDER BY t.datetime_transaction DESC, t.id DESC), '[]') FROM recent_transactions t)",
+    'payments': "(SELECT coalesce(json_agg(p ORDER BY p.datetime_payment DESC, p.id DESC), '[]') FROM recent_payments p)",
+}
+SUMMARY_FIELDS = GROUP_FIELDS + tuple(QUERY_FIELDS)
+
+# Same keys as Transaction.to_dict / Payment.to_dict; both walk the (group_id, datetime, id) index
+RECENT_CTES = {
+    'transactions': """recent_transactions AS (
+        SELECT id, group_id, description, amount, paid_by, mode, paid_for, share_details, datetime_transaction, is_saved
+        FROM transactions WHERE group_id = :group_id
+        ORDER BY datetime_transaction DESC, id DESC LIMIT :limit)""",
+    'payments': """recent_payments AS (
+        SELECT id, group_id, amount, paid_from, paid_to, datetime_payment
+        FROM payments WHERE group_id = :group_id
+        ORDER BY datetime_payment DESC, id DESC LIMIT :limit)""",
+}
+
+
+def parse_summary_fields(value):
+    if not value:
+        return list(SUMMARY_FIELDS)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in SUMMARY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Choose from: {', '.join(SUMMARY_FIELDS)}")
+    return fields
+
+
+def group_aggregates_statement(fields):
+    # Everything that isn't on the group row, in one round trip; None when nothing is needed
+    selected = [field for field in QUERY_FIELDS if field in fields]
+    if not selected:
+        return None
+    ctes = [RECENT_CTES[field] for field in selected if field in RECENT_CTES]
+    return text(("WITH " + ", ".join(ctes) + " " if ctes else "") +
+                "SELECT " + ", ".join(f"{QUERY_FIELDS[field]} AS {field}" for field in selected))
+
+
+def load_group_aggregates(group_id, fields, limit):
+    statement = group_aggregates_statement(fields)
+    if statement is None:
+        return {}
+    return dict(db.session.execute(statement, {'group_id': group_id, 'limit': limit}).mappings().one())
@@ -0,0 +1,105 @@
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from backend.db import db
+from backend.models.member_total import GroupMemberTotal
+
+
+def _add_entries(totals, paid_by, share_details, sign):
+    involved = set()
+    for payer in paid_by or []:
+        entry = totals.setdefault(payer['username'], {'spent': 0, 'paid': 0, 'count': 0})
+        entry['paid'] += sign * payer['amount']
+        involved.add(payer['username'])
+    for share in share_details or []:
+        entry = totals.setdefault(share['username'], {'spent': 0, 'paid': 0, 'count': 0})
+        entry['spent'] += sign * share['amount']
+        involved.add(share['username'])
+    for username in involved:
+        totals[username]['count'] += sign
+
+
+def transaction_total_deltas(transaction, operation, old_share_details=None, old_paid_by=None):
+    totals = {}
+    if operation == 'add':
+        _add_entries(totals, transaction.paid_by, transaction.share_details, 1)
+    elif operation == 'update':
+        _add_entries(totals, old_paid_by, old_share_details, -1)
+        _add_entries(totals, transaction.paid_by, transaction.share_details, 1)
+    elif operation == 'delete':
+        _add_entries(totals, transaction.paid_by, transaction.share_details, -1)
+    return totals
+
+
+def apply_member_totals(group_id, totals):
+    rows = [{'group_id': group_id, 'username': username, 'total_spent': entry['spent'],
+             'total_paid': entry['paid'], 'transaction_count': entry['count']}
+            for username, entry in sorted(totals.items()) if any(entry.values())]
+    if not rows:
+        return
+
+    # Increment in place so concurrent writers to the same member never overwrite each other;
+    # rows are sorted so that writers always lock members in the same order
+    statement = insert(GroupMemberTotal).values(rows)
+    table = GroupMemberTotal.__table__
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.group_id, table.c.username],
+        set_={
+            'total_spent': table.c.total_spent + statement.excluded.total_spent,
+            'total_paid': table.c.total_paid + statement.excluded.total_paid,
+            'transaction_count': table.c.transaction_count + statement.excluded.transaction_count,
+        }
+    )
+    db.session.execute(statement)
+
+
+# The new name can already have a row (a deleted member's name, deleted again after being
+# re-added), so the old row is folded into it rather than renamed
+MERGE_MEMBER_TOTALS_SQL = """
+INSERT INTO group_member_totals (group_id, username, total_spent, total_paid, transaction_count)
+SELECT group_id, :new_username, total_spent, total_paid, transaction_count
+FROM group_member_totals WHERE group_id = :group_id AND username = :old_username
+ON CONFLICT (group_id, username) DO UPDATE SET
+    total_spent = group_member_totals.total_spent + excluded.total_spent,
+    total_paid = group_member_totals.total_paid + excluded.total_paid,
+    transaction_count = group_member_totals.transaction_count + excluded.transaction_count
+"""
+
+
+def rename_member_totals(group_id, old_username, new_username):
+    params = {'group_id': group_id, 'old_username': old_username, 'new_username': new_username}
+    db.session.execute(text(MERGE_MEMBER_TOTALS_SQL), params)
+    GroupMemberTotal.query.filter_by(group_id=group_id, username=old_username).delete(synchronize_session=False)
+
+
+REBUILD_MEMBER_TOTALS_SQL = """
+INSERT INTO group_member_totals (group_id, username, total_spent, total_paid, transaction_count)
+SELECT t.group_id,
+       e.value ->> 'username',
+       SUM(CASE WHEN e.role = 'share' THEN (e.value ->> 'amount')::float ELSE 0 END),
+       SUM(CASE WHEN e.role = 'payer' THEN (e.value ->> 'amount')::float ELSE 0 END),
+       COUNT(DISTINCT t.id)
+FROM (
+    SELECT id, group_id, paid_by, share_details FROM transactions
+    UNION ALL
+    -- Archived months still count towards the totals
+    SELECT (archived.value ->> 'id')::integer, a.group_id, archived.value -> 'paid_by', archived.value -> 'share_details'
+    FROM transactions_archive a CROSS JOIN LATERAL jsonb_array_elements(a.rows) AS archived
+) t
+CROSS JOIN LATERAL (
+    SELECT value, 'share' AS role FROM jsonb_array_elements(COALESCE(t.share_details, '[]'::jsonb))
+    UNION ALL
+    SELECT value, 'payer' AS role FROM jsonb_array_elements(COALESCE(t.paid_by, '[]'::jsonb))
+) e
+WHERE (CAST(:group_id AS integer) IS NULL OR t.group_id = :group_id)
+GROUP BY t.group_id, e.value ->> 'username'
+"""
+
+
+def rebuild_member_totals(group_id=None):
+    query = GroupMemberTotal.query
+    if group_id is not None:
+        query = query.filter_by(group_id=group_id)
+    # A full rebuild, including the delete of every existing row, can run far past DB_STATEMENT_TIMEOUT_MS
+    db.session.execute(text("SET LOCAL statement_timeout = 0"))
+    query.delete(synchronize_session=False)
+    db.session.execute(text(REBUILD_MEMBER_TOTALS_SQL), {'group_id': group_id})
@@ -0,0 +1,52 @@
+import zlib
+from functools import wraps
+from flask import request, make_response
+from sqlalchemy import text
+from sqlalchemy.orm.attributes import set_committed_value
+from backend.db import db
+from backend.helper.group_cache import group_snapshot, mark_group_changed
+from backend.helper.serialization import wants_msgpack
+
+
+def bump_group_version(group):
+    version = db.session.execute(text("UPDATE groups SET version = version + 1 WHERE id = :group_id RETURNING version"),
+                                 {'group_id': group.id}).scalar()
+    set_committed_value(group, 'version', version)
+    mark_group_changed(group.id, version)
+    return version
+
+
+def group_version(group_id):
+    snapshot = group_snapshot(group_id)
+    return snapshot['version'] if snapshot else None
+
+
+def etag_for(group_id, version, query_string, representation=''):
+    # The query string is folded in so that each page, filter or mode gets its own tag
+    return f"g{group_id}-v{version}-{zlib.crc32(query_string):08x}{representation}"
+
+
+def group_etag(group_id, version):
+    # MessagePack and JSON bodies of the same version are different representations
+    return etag_for(group_id, version, request.query_string, '-msgpack' if wants_msgpack() else '')
+
+
+def versioned(view):
+    # Answers If-None-Match with 304 from the cached group version, or a single primary-key lookup
+    @wraps(view)
+    def wrapper(group_id, *args, **kwargs):
+        version = group_version(group_id)
+        if version is None:
+            return view(group_id, *args, **kwargs)
+
+        etag = group_etag(group_id, version)
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+            response.set_etag(etag, weak=True)
+            return response
+
+        response = make_response(view(group_id, *args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(etag, weak=True)
+        return response
+    return wrapper
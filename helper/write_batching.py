@@ -0,0 +1,132 @@
+import threading
+from concurrent.futures import Future
+from sqlalchemy.orm.attributes import set_committed_value
+from backend.db import db
+from backend.models.group import Group
+from backend.helper.balances import write_balance_deltas
+from backend.helper.versioning import bump_group_version
+from backend.helper.metrics import metrics
+
+
+class GroupWriteBatcher:
+    # Group commit for bursts of writes to one group. The first writer to arrive leads a batch:
+    # it waits up to `window` seconds (or until `max_size` writes have joined), then runs every
+    # queued write in its own database transaction with one group lock, one balance UPDATE and
+    # one commit. Each write runs in a savepoint, so one failing write doesn't sink the others.
+
+    def __init__(self, window=0.01, max_size=50):
+        self.enabled = False
+        self.window = window
+        self.max_size = max_size
+        self._open = {}  # group_id -> batch still accepting writes
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config['WRITE_BATCHING_ENABLED']
+        self.window = app.config['WRITE_BATCH_WINDOW']
+        self.max_size = app.config['WRITE_BATCH_MAX_SIZE']
+
+    def submit(self, group_id, work):
+        future = Future()
+        with self._lock:
+            batch = self._open.get(group_id)
+            leader = batch is None
+            if leader:
+                batch = self._open[group_id] = {'writes': [], 'full': threading.Event()}
+            batch['writes'].append((work, future))
+            self._queued += 1
+            if len(batch['writes']) >= self.max_size:
+                # Later writers start a new batch, which queues behind this one on the group lock
+                del self._open[group_id]
+                batch['full'].set()
+
+        if leader:
+            batch['full'].wait(self.window)
+            with self._lock:
+                if self._open.get(group_id) is batch:
+                    del self._open[group_id]
+                self._queued -= len(batch['writes'])
+            run_batch(group_id, batch['writes'])
+        return future.result()
+
+    def stats(self):
+        with self._lock:
+            return {'queued': self._queued, 'open_batches': len(self._open)}
+
+
+write_batcher = GroupWriteBatcher()
+
+
+def run_group_write(group_id, work):
+    # work(group) stages one write without committing and returns (body, status). Without
+    # batching it runs here and commits on its own; with batching it joins the group's batch.
+    if write_batcher.enabled:
+        return write_batcher.submit(group_id, work)
+
+    group = Group.query.get(group_id)
+    if not group:
+        return {"message": "Group not found"}, 404
+    body, status = work(group)
+    if status < 400:
+        db.session.commit()
+    return body, status
+
+
+def run_batch(group_id, writes):
+    metrics.observe('splitter_write_batch_size', (), len(writes))
+    results = []
+    try:
+        group = Group.query.get(group_id)
+        if not group:
+            for _, future in writes:
+                future.set_result(({"message": "Group not found"}, 404))
+            return
+
+        # Locks the group row for the whole batch; every write in it lands in this one version
+        bump_group_version(group)
+        pending = db.session.info.setdefault('batched_balance_deltas', {})[group.id] = {}
+        for work, future in writes:
+            balances, pending_before = dict(group.balances or {}), dict(pending)
+            changes_before = len(db.session.info.get('group_changes', ()))
+            savepoint = db.session.begin_nested()
+            try:
+                body, status = work(group)
+            except Exception as e:
+                savepoint.rollback()
+                restore(group, balances, pending, pending_before, changes_before)
+                future.set_exception(e)
+                continue
+            if status < 400:
+                savepoint.commit()
+                results.append((future, (body, status)))
+            else:
+                savepoint.rollback()
+                restore(group, balances, pending, pending_before, changes_before)
+                future.set_result((body, status))
+
+        if not results:
+            db.session.rollback()
+            return
+        write_balance_deltas(group, {username: delta for username, delta in pending.items() if delta}, version_step=0)
+        db.session.commit()
+    except Exception as e:
+        # The commit failed, so none of the batch's writes happened
+        db.session.rollback()
+        for _, future in writes:
+            if not future.done():
+                future.set_exception(e)
+        return
+    finally:
+        db.session.info.pop('batched_balance_deltas', None)
+
+    for future, result in results:
+        future.set_result(result)
+
+
+def restore(group, balances, pending, pending_before, changes_before):
+    # Undo a rolled back write's share of the batch's balance changes and change events
+    set_committed_value(group, 'balances', balances)
+    pending.clear()
+    pending.update(pending_before)
+    del db.session.info.get('group_changes', [])[changes_before:]
@@ -0,0 +1,24 @@
+from backend.db import db
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+
+class BalanceCheckpoint(db.Model):
+    __tablename__ = 'balance_checkpoints'
+    __table_args__ = (db.Index('ix_balance_checkpoints_group_id_event_id', 'group_id', 'event_id', postgresql_ops={'event_id': 'DESC'}),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False)
+    event_id = db.Column(db.BigInteger, nullable=False)  # last ledger event folded into balances
+    balances = db.Column(JSONB, nullable=False)
+    created_at = db.Column(db.TIMESTAMP(timezone=True), nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<BalanceCheckpoint {self.group_id}@{self.event_id}>"
+
+    def to_dict(self):
+        return {
+            'group_id': self.group_id,
+            'event_id': self.event_id,
+            'balances': self.balances,
+            'created_at': self.created_at.isoformat()
+        }
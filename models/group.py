@@ -8,6 +8,8 @@ class Group(db.Model):
     name= db.Column(db.Text, nullable=False)
     usernames = db.Column(JSONB, nullable=False)  # JSON array of (username, upi_id)
     balances = db.Column(JSONB, default=dict)  # JSON object to store user balances
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # bumped on every change to the group
+    events_since_checkpoint = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # ledger events after the latest balance checkpoint
     transactions = db.relationship('Transaction', backref='group', lazy='dynamic')
     payments=db.relationship('Payment', backref='group', lazy='dynamic')
 
@@ -19,5 +21,6 @@ class Group(db.Model):
             'id': self.id,
             'name': self.name,
             'usernames': self.usernames,
-            'balances': self.balances
+            'balances': self.balances,
+            'version': self.version
         }
@@ -0,0 +1,22 @@
+from backend.db import db
+
+class GroupMembership(db.Model):
+    # One row per member of each group, mirroring Group.usernames so a person's groups can be
+    # found without scanning every group's JSONB
+    __tablename__ = 'group_memberships'
+    __table_args__ = (db.Index('ix_group_memberships_username', 'username', 'group_id'),
+                      db.Index('ix_group_memberships_upi_id', 'upi_id', 'group_id', postgresql_where=db.text('upi_id IS NOT NULL')),)
+
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), primary_key=True)
+    username = db.Column(db.Text, primary_key=True)
+    upi_id = db.Column(db.Text)
+
+    def __repr__(self):
+        return f"<GroupMembership {self.group_id}:{self.username}>"
+
+    def to_dict(self):
+        return {
+            'group_id': self.group_id,
+            'username': self.username,
+            'upi_id': self.upi_id
+        }
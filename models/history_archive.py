@@ -0,0 +1,37 @@
+from backend.db import db
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+class ArchivedMonth:
+    # One row per group and month of archived history. The rows are packed into a single
+    # JSONB array so postgres compresses them out of line (TOAST), and the totals stay queryable.
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    row_count = db.Column(db.Integer, nullable=False)
+    total_amount = db.Column(db.Float, nullable=False)
+    rows = db.Column(JSONB, nullable=False)  # the archived rows as Transaction/Payment.to_dict would emit them
+    archived_at = db.Column(db.TIMESTAMP(timezone=True), nullable=False, default=datetime.now)
+
+    def to_dict(self):
+        return {
+            'group_id': self.group_id,
+            'month': self.month.isoformat(),
+            'row_count': self.row_count,
+            'total_amount': self.total_amount,
+            'archived_at': self.archived_at.isoformat()
+        }
+
+
+class TransactionArchive(ArchivedMonth, db.Model):
+    __tablename__ = 'transactions_archive'
+
+    def __repr__(self):
+        return f"<TransactionArchive {self.group_id}@{self.month}>"
+
+
+class PaymentArchive(ArchivedMonth, db.Model):
+    __tablename__ = 'payments_archive'
+
+    def __repr__(self):
+        return f"<PaymentArchive {self.group_id}@{self.month}>"
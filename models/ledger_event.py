@@ -0,0 +1,31 @@
+from backend.db import db
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+
+class LedgerEvent(db.Model):
+    __tablename__ = 'ledger_events'
+    __table_args__ = (db.Index('ix_ledger_events_group_id_id', 'group_id', 'id'),)
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False)
+    entity_type = db.Column(db.Text, nullable=False)  # 'group', 'member', 'transaction', 'payment' or 'import'
+    entity_id = db.Column(db.Integer)
+    operation = db.Column(db.Text, nullable=False)  # 'add', 'update', 'delete', 'rename' or 'remove'
+    deltas = db.Column(JSONB, nullable=False, default=dict)  # JSON object of username -> balance change
+    payload = db.Column(JSONB)
+    created_at = db.Column(db.TIMESTAMP(timezone=True), nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<LedgerEvent {self.id}>"
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'group_id': self.group_id,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'operation': self.operation,
+            'deltas': self.deltas,
+            'payload': self.payload,
+            'created_at': self.created_at.isoformat()
+        }
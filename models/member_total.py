@@ -0,0 +1,21 @@
+from backend.db import db
+
+class GroupMemberTotal(db.Model):
+    __tablename__ = 'group_member_totals'
+
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), primary_key=True)
+    username = db.Column(db.Text, primary_key=True)
+    total_spent = db.Column(db.Float, nullable=False, default=0)  # sum of the member's shares
+    total_paid = db.Column(db.Float, nullable=False, default=0)  # sum of what the member paid
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<GroupMemberTotal {self.group_id}:{self.username}>"
+
+    def to_dict(self):
+        return {
+            'username': self.username,
+            'total_spent': self.total_spent,
+            'total_paid': self.total_paid,
+            'transaction_count': self.transaction_count
+        }
@@ -5,7 +5,7 @@ from sqlalchemy.dialects.postgresql import JSONB
 
 class Payment(db.Model):
     __tablename__ = 'payments'
-    __table_args__ = (db.Index('ix_payments_group_id_datetime', 'group_id', 'datetime_payment', postgresql_ops={'datetime_payment': 'DESC'}),
+    __table_args__ = (db.Index('ix_payments_group_id_datetime', 'group_id', 'datetime_payment', 'id', postgresql_ops={'datetime_payment': 'DESC', 'id': 'DESC'}),
                       CheckConstraint('amount > 0', name='check_amount_positive'),)
     
     id = db.Column(db.Integer, primary_key=True)
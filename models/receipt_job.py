@@ -0,0 +1,30 @@
+from backend.db import db
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+
+class ReceiptJob(db.Model):
+    __tablename__ = 'receipt_jobs'
+    __table_args__ = (db.Index('ix_receipt_jobs_group_id', 'group_id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False)
+    status = db.Column(db.Text, nullable=False, default='queued')  # 'queued', 'running', 'done' or 'failed'
+    image_path = db.Column(db.Text, nullable=False)
+    result = db.Column(JSONB)  # JSON object with items (description, amount), tax, discount and total
+    error = db.Column(db.Text)
+    created_at = db.Column(db.TIMESTAMP(timezone=True), nullable=False, default=datetime.now)
+    updated_at = db.Column(db.TIMESTAMP(timezone=True), nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f"<ReceiptJob {self.id}>"
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'group_id': self.group_id,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
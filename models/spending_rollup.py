@@ -0,0 +1,24 @@
+from backend.db import db
+
+class DailySpending(db.Model):
+    __tablename__ = 'daily_spending'
+    __table_args__ = (db.Index('ix_daily_spending_group_id_day', 'group_id', 'day'),)
+
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), primary_key=True)
+    member = db.Column(db.Text, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # UTC day of datetime_transaction
+    spent = db.Column(db.Float, nullable=False, default=0)  # sum of the member's shares that day
+    paid = db.Column(db.Float, nullable=False, default=0)  # sum of what the member paid that day
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailySpending {self.group_id}:{self.member}@{self.day}>"
+
+    def to_dict(self):
+        return {
+            'member': self.member,
+            'day': self.day.isoformat(),
+            'spent': self.spent,
+            'paid': self.paid,
+            'transaction_count': self.transaction_count
+        }
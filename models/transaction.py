@@ -1,10 +1,17 @@
 from backend.db import db
 from datetime import datetime
-from sqlalchemy import CheckConstraint
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import CheckConstraint, Computed
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import deferred
 class Transaction(db.Model):
     __tablename__ = 'transactions'
-    __table_args__ = (db.Index('ix_transactions_group_id_datetime', 'group_id', 'datetime_transaction', postgresql_ops={'datetime_transaction': 'DESC'}),
+    __table_args__ = (db.Index('ix_transactions_group_id_datetime', 'group_id', 'datetime_transaction', 'id', postgresql_ops={'datetime_transaction': 'DESC', 'id': 'DESC'}),
+                      # History filters: payer/participant containment (@>), description search, amount and mode
+                      db.Index('ix_transactions_paid_by', 'paid_by', postgresql_using='gin', postgresql_ops={'paid_by': 'jsonb_path_ops'}),
+                      db.Index('ix_transactions_share_details', 'share_details', postgresql_using='gin', postgresql_ops={'share_details': 'jsonb_path_ops'}),
+                      db.Index('ix_transactions_search_vector', 'search_vector', postgresql_using='gin'),
+                      db.Index('ix_transactions_group_id_amount', 'group_id', 'amount'),
+                      db.Index('ix_transactions_group_id_mode', 'group_id', 'mode'),
                       CheckConstraint('amount > 0', name='check_amount_positive'),)
     id = db.Column(db.Integer, primary_key=True) 
     group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False) 
@@ -16,6 +23,8 @@ class Transaction(db.Model):
     share_details = db.Column(JSONB)  # JSON array of (username, amount)
     datetime_transaction = db.Column(db.TIMESTAMP(timezone=True), nullable=False, default=datetime.now()) 
     is_saved = db.Column(db.Boolean, default=False)
+    # Kept up to date by postgres; deferred so history reads don't ship it
+    search_vector = deferred(db.Column(TSVECTOR, Computed("to_tsvector('english', coalesce(description, ''))", persisted=True)))
 
     def __repr__(self):
         return f"<Transaction {self.id}>"
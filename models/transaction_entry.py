@@ -0,0 +1,28 @@
+from backend.db import db
+
+class TransactionEntry(db.Model):
+    __tablename__ = 'transaction_entries'
+    __table_args__ = (db.Index('ix_transaction_entries_group_id_member', 'group_id', 'member', 'transaction_id'),
+                      db.Index('ix_transaction_entries_transaction_id', 'transaction_id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: once transactions is partitioned its primary key is (id, datetime_transaction),
+    # so entries are deleted alongside their transaction by delete_transaction_entries instead
+    transaction_id = db.Column(db.Integer, nullable=False)
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False)
+    member = db.Column(db.Text, nullable=False)
+    role = db.Column(db.Text, nullable=False)  # 'payer' (from paid_by) or 'share' (from share_details)
+    amount = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"<TransactionEntry {self.id}>"
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'transaction_id': self.transaction_id,
+            'group_id': self.group_id,
+            'member': self.member,
+            'role': self.role,
+            'amount': self.amount
+        }
@@ -0,0 +1,97 @@
+import threading
+from flask_socketio import SocketIO, join_room, leave_room
+from sqlalchemy import event
+from sqlalchemy.orm.util import identity_key
+from backend.db import db
+from backend.models.group import Group
+from backend.models.ledger_event import LedgerEvent
+
+socketio = SocketIO()
+
+
+def group_room(group_id):
+    return f"group:{group_id}"
+
+
+@socketio.on('join')
+def on_join(data):
+    join_room(group_room(int(data['group_id'])))
+
+
+@socketio.on('leave')
+def on_leave(data):
+    leave_room(group_room(int(data['group_id'])))
+
+
+class GroupChangeCoalescer:
+    # Buffers committed changes per group and emits one 'group_changed' event per window,
+    # with the balance deltas summed per member and the touched rows listed once.
+
+    def __init__(self, window=0.05):
+        self.window = window
+        self.emitter = None  # replaced by asgi.py to publish through the async Socket.IO server
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def add(self, group_id, version, deltas, change):
+        with self._lock:
+            pending = self._pending.get(group_id)
+            schedule = pending is None
+            if schedule:
+                pending = self._pending[group_id] = {'version': version, 'deltas': {}, 'changes': []}
+            pending['version'] = max(pending['version'] or 0, version or 0)
+            for username, delta in deltas.items():
+                pending['deltas'][username] = pending['deltas'].get(username, 0) + delta
+            if change not in pending['changes']:
+                pending['changes'].append(change)
+        if schedule:
+            socketio.start_background_task(self._flush_later, group_id)
+
+    def _flush_later(self, group_id):
+        socketio.sleep(self.window)
+        self.flush(group_id)
+
+    def flush(self, group_id):
+        with self._lock:
+            pending = self._pending.pop(group_id, None)
+        if pending:
+            (self.emitter or socketio.emit)('group_changed', {'group_id': group_id, **pending}, to=group_room(group_id))
+
+
+coalescer = GroupChangeCoalescer()
+
+
+def collect_group_changes(session, flush_context):
+    # Every write path records a ledger event, so new events are the change feed
+    for obj in session.new:
+        if isinstance(obj, LedgerEvent):
+            group = session.identity_map.get(identity_key(Group, obj.group_id))
+            session.info.setdefault('group_changes', []).append((
+                obj.group_id, group.version if group is not None else None, dict(obj.deltas or {}),
+                {'entity_type': obj.entity_type, 'operation': obj.operation, 'id': obj.entity_id}))
+
+
+def publish_group_changes(session):
+    # Savepoint commits fire after_commit too; changes go out only once the outer transaction commits
+    if session.in_nested_transaction():
+        return
+    for group_id, version, deltas, change in session.info.pop('group_changes', ()):
+        coalescer.add(group_id, version, deltas, change)
+
+
+def discard_group_changes(session, previous_transaction=None):
+    # A rolled back savepoint only undoes its own changes; write batches trim those themselves
+    if previous_transaction is not None and previous_transaction.nested:
+        return
+    session.info.pop('group_changes', None)
+
+
+def init_websocket(app):
+    # SOCKETIO_MESSAGE_QUEUE fans events out across worker processes; any URL python-socketio
+    # understands works (redis://... for Redis, or a kombu URL such as memory:// for one host)
+    socketio.init_app(app, message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'])
+    coalescer.window = app.config['SOCKETIO_COALESCE_WINDOW']
+    if not event.contains(db.session, 'after_flush', collect_group_changes):
+        event.listen(db.session, 'after_flush', collect_group_changes)
+        event.listen(db.session, 'after_commit', publish_group_changes)
+        event.listen(db.session, 'after_soft_rollback', discard_group_changes)